@@ -1,16 +1,107 @@
+import time
+
 import streamlit as st
 
-from util.io import load_data, process_data, get_locations
+from util import config, queries, timing
+from util.io import get_locations
+from util.cache import freeze, sources_key
+from util.figures import FigureCache, figure_key
+from util.ingest import DATASET_NAME, load_dataset, load_quality, load_rollups
+from util.schema import memory_report
+from util.routes import RouteIndex, build_routes
+from util.stations import build_stations
+from util.timeseries import WIDE_CHART_WIDTH, chart_points, downsample
+from util.viz import route_segments
 
-@st.cache_data
+# Loaded once per process and shared read-only by every session: pages must
+# derive new columns on their own copy (df.assign / df.copy) rather than df[...] = ...
+@timing.cached(st.cache_resource)
 def get_data():
-    df_raw = load_data()
-    tables = process_data(df_raw)
-    return tables
+    return freeze(load_dataset())
+
+@timing.cached(st.cache_resource)
+def get_rollups():
+    return load_rollups(get_data())
+
+@timing.cached(st.cache_resource)
+def get_route_index():
+    return RouteIndex(get_data())
+
+@timing.cached(st.cache_resource)
+def get_quality():
+    return load_quality(get_data())
 
-@st.cache_data
+def get_quarantine_path():
+    return config.quarantine_path()
+
+@timing.cached(st.cache_resource)
+def get_memory_report():
+    return memory_report(get_data())
+
+@timing.cached(st.cache_resource)
 def get_station_coord():
-    return get_locations()
+    return freeze(get_locations())
+
+@timing.cached(st.cache_resource)
+def get_stations():
+    return freeze(build_stations(get_data(), get_station_coord()))
+
+@timing.cached(st.cache_resource(max_entries=512))
+def get_station_series(station, width=WIDE_CHART_WIDTH):
+    """Average arrival delay per date of the routes leaving `station`, downsampled for a chart `width` pixels wide."""
+    series = queries.station_series(station, get_data(), get_route_index())
+    return freeze(downsample(series, "Date", "Retard moyen de tous les trains à l'arrivée", chart_points(width)))
+
+@timing.cached(st.cache_resource)
+def get_routes():
+    return freeze(build_routes(get_rollups(), get_stations()))
+
+@timing.cached(st.cache_resource)
+def get_route_segments():
+    """{delay category: (lat, lon)} NaN-separated segment arrays of the routes, one line trace each."""
+    return {
+        category: route_segments(routes)
+        for category, routes in get_routes().groupby("Delay Category", observed=True)
+    }
+
+@timing.cached(st.cache_resource)
+def get_dataset_version():
+    return f"{DATASET_NAME}-{sources_key(config.data_paths())[:16]}"
+
+@st.cache_resource
+def get_figure_cache():
+    return FigureCache()
+
+def cached_figure(name, build, **state):
+    """Figure `name` for the current dataset and widget `state`; `build()` is only called on a cache miss.
+
+    The returned figure may be shared with other sessions: do not modify it.
+    """
+    start = time.perf_counter()
+    key = figure_key(name, get_dataset_version(), state)
+    fig, hit = get_figure_cache().get(key, build)
+    timing.record("figure", name, time.perf_counter() - start, cache="hit" if hit else "miss")
+    return fig
+
+def plotly_chart(fig, **kwargs):
+    """st.plotly_chart, timed under the figure title."""
+    with timing.timed(fig.layout.title.text or "untitled chart", kind="chart"):
+        st.plotly_chart(fig, **kwargs)
+
+def timing_panel():
+    """End the page timing; show it in the sidebar in debug mode and append it to SNCF_TIMINGS_PATH."""
+    timing.end_page()
+    records = timing.run_records()
+    if config.timings_path():
+        timing.dump(config.timings_path(), records)
+    if not (config.debug() or st.query_params.get("debug")):
+        return
+    with st.sidebar.expander("⏱️ Timings"):
+        st.caption("This run")
+        st.dataframe(timing.summary(records), hide_index=True)
+        st.caption("All runs since the server started")
+        st.dataframe(timing.summary(), hide_index=True)
+        st.download_button("Download JSON lines", timing.dumps(), file_name="timings.jsonl")
     
 st.set_page_config(
     page_title="Data Storytelling Dashboard",
@@ -0,0 +1,237 @@
+"""Benchmark the load -> clean -> aggregate pipeline.
+
+Times each stage on data/data.csv, on copies scaled by route and month
+replication and on generated datasets of a given size (see bench.synthetic),
+recording wall time (best of `--repeat` runs) and peak traced memory. Results are appended to
+bench/results.jsonl tagged with the git revision, and each run is compared
+with the latest results of a different revision:
+
+    python -m bench.run --scales 1 10 100 --rows 1000000 --repeat 3
+
+The page steps call the util.queries functions used by the aggregation
+block of each page. The import cost of each page (its top-level imports,
+run in a fresh interpreter with -X importtime) is reported as the
+"imports" dataset.
+"""
+import argparse
+import ast
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
+
+from bench.synthetic import generate_csv, scale_csv
+from util import config, queries
+from util.cache import freeze
+from util.features import add_features
+from util.ingest import load_dataset, load_rollups
+from util.io import get_locations, load_data, process_data
+from util.quality import quality_report
+from util.rollup import build_rollups
+from util.stations import build_stations, missing_coordinates
+from util.viz import hover_template
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_PATH = os.path.join(ROOT, "bench", "results.jsonl")
+
+
+def measure(func, repeat):
+    """Best wall time of `repeat` calls to `func`, peak traced memory (MB) and the last result."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak / 2**20, result
+
+
+def page_exploration(cube, stations):
+    return (
+        queries.monthly_series(cube),
+        queries.top_delayed_routes(10, cube),
+        queries.mean_causes(cube),
+        queries.station_delays(cube, stations),
+    )
+
+
+def page_delays(df, cube):
+    return (
+        queries.monthly_profile(cube),
+        queries.route_seasonal_impact(cube),
+        queries.seasonal_causes(cube),
+        queries.summer_impact(df),
+        queries.delay_heatmap(cube),
+    )
+
+
+def page_overall(cube, stations):
+    stats = queries.station_stats(cube, stations)
+    missing_coordinates(stations, stats["Station"])
+    return hover_template(stats, "<b>{Station}</b>", [
+        ("Average Delay", "{Average Delay:.2f} min"),
+        ("Std Deviation", "{Delay Std Dev:.2f} min"),
+        ("Total Services", "{Total Services:,d}"),
+    ])
+
+
+def bench_dataset(path, repeat):
+    """Time every stage on the CSV at `path`, with a private cache directory."""
+    results = []
+
+    def step(name, func):
+        seconds, peak_mb, result = measure(func, repeat)
+        results.append({"step": name, "seconds": seconds, "peak_mb": peak_mb})
+        return result
+
+    # The user's cache and quarantine file are left alone, even if a step raises
+    with tempfile.TemporaryDirectory() as cache_dir, mock.patch.dict(
+        os.environ,
+        SNCF_CACHE_DIR=cache_dir,
+        SNCF_QUARANTINE_PATH=os.path.join(cache_dir, "quarantine.csv"),
+    ):
+        raw = step("load_data", lambda: load_data(path))
+        clean = step("process_data", lambda: process_data(raw))
+        df = step("add_features", lambda: add_features(clean))
+        step("quality_report", lambda: quality_report(df, {}))
+        cube = step("build_rollups", lambda: build_rollups(df))
+
+        def cold():
+            for name in os.listdir(cache_dir):
+                os.remove(os.path.join(cache_dir, name))
+            return load_dataset(path)
+
+        step("load_dataset (cold)", cold)
+        df = step("load_dataset (cached)", lambda: freeze(load_dataset(path)))
+        load_rollups(df, path)
+        cube = step("load_rollups (cached)", lambda: load_rollups(df, path))
+        stations = step("build_stations", lambda: build_stations(df, get_locations()))
+        step("page: exploration", lambda: page_exploration(cube, stations))
+        step("page: delays", lambda: page_delays(df, cube))
+        step("page: overall view", lambda: page_overall(cube, stations))
+    return len(df), results
+
+
+def page_imports(path):
+    """Source of the top-level imports of a page script, lazy_import calls included."""
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+    statements = []
+    for node in ast.parse(source).body:
+        lazy = (
+            isinstance(node, ast.Assign)
+            and isinstance(node.value, ast.Call)
+            and getattr(node.value.func, "id", None) == "lazy_import"
+        )
+        if isinstance(node, (ast.Import, ast.ImportFrom)) or lazy:
+            statements.append(ast.get_source_segment(source, node))
+    return "\n".join(statements)
+
+
+def import_time(code, baseline=()):
+    """Seconds spent importing in `code`, run in a fresh interpreter, and the heaviest top-level modules.
+
+    Modules listed in `baseline` (those loaded at interpreter startup) are ignored.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        env={**os.environ, "PYTHONPATH": ROOT},
+        capture_output=True,
+        text=True,
+    )
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit() and not name[1:].startswith(" ") and name.strip() not in baseline:
+                modules[name.strip()] = int(cumulative) / 1e6
+    return sum(modules.values()), sorted(modules, key=modules.get, reverse=True)
+
+
+def bench_imports():
+    results = []
+    startup = import_time("pass")[1]
+    for path in [os.path.join(ROOT, "Project.py"), *sorted(glob.glob(os.path.join(ROOT, "pages", "*.py")))]:
+        seconds, heaviest = import_time(page_imports(path), startup)
+        results.append({"step": f"import {os.path.basename(path)}", "seconds": seconds, "peak_mb": None, "heaviest": heaviest[:3]})
+    return results
+
+
+def git_version():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return out.stdout.strip() + ("-dirty" if dirty.stdout.strip() else "")
+
+
+def read_results(path=RESULTS_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def baseline(history, version):
+    """Latest result per (dataset, step) recorded by another version."""
+    latest = {}
+    for record in history:
+        if record["version"] != version:
+            latest[record["dataset"], record["step"]] = record
+    return latest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--rows", type=int, nargs="*", default=[], help="sizes of generated datasets")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--data", default=None, help="source CSV (default: the configured data path)")
+    parser.add_argument("--output", default=RESULTS_PATH)
+    args = parser.parse_args(argv)
+
+    source = args.data or config.data_path()
+    version = git_version()
+    previous = baseline(read_results(args.output), version)
+    timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    datasets = [(f"x{scale}", scale) for scale in args.scales] + [(f"synthetic-{rows}", rows) for rows in args.rows]
+
+    print(f"{'dataset':<18} {'rows':>10}  {'step':<28} {'seconds':>9} {'peak MB':>9}  vs. previous")
+    with tempfile.TemporaryDirectory() as work, open(args.output, "a", encoding="utf-8") as out:
+
+        def report(dataset, rows, results):
+            for result in results:
+                record = {"version": version, "timestamp": timestamp, "dataset": dataset, "rows": rows, **result}
+                out.write(json.dumps(record) + "\n")
+                before = previous.get((dataset, result["step"]))
+                delta = f"{result['seconds'] / before['seconds'] - 1:+.0%} ({before['version']})" if before else ""
+                peak = "" if result["peak_mb"] is None else f"{result['peak_mb']:.1f}"
+                print(f"{dataset:<18} {rows:>10,}  {result['step']:<28} {result['seconds']:>9.3f} {peak:>9}  {delta}")
+
+        report("imports", 0, bench_imports())
+        for dataset, size in datasets:
+            path = source
+            if dataset.startswith("synthetic"):
+                path = os.path.join(work, f"{dataset}.csv")
+                generate_csv(path, size)
+            elif size != 1:
+                path = os.path.join(work, f"data-{dataset}.csv")
+                scale_csv(source, path, size)
+            report(dataset, *bench_dataset(path, args.repeat))
+            if path != source:
+                os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import argparse
+import csv
+
+import numpy as np
+import pandas as pd
+
+from util import config
+
+# Columns of the SNCF regularity extract, in file order.
+COLUMNS = [
+    "Date",
+    "Service",
+    "Gare de départ",
+    "Gare d'arrivée",
+    "Durée moyenne du trajet",
+    "Nombre de circulations prévues",
+    "Nombre de trains annulés",
+    "Commentaire annulations",
+    "Nombre de trains en retard au départ",
+    "Retard moyen des trains en retard au départ",
+    "Retard moyen de tous les trains au départ",
+    "Commentaire retards au départ",
+    "Nombre de trains en retard à l'arrivée",
+    "Retard moyen des trains en retard à l'arrivée",
+    "Retard moyen de tous les trains à l'arrivée",
+    "Commentaire retards à l'arrivée",
+    "Nombre trains en retard > 15min",
+    "Retard moyen trains en retard > 15 (si liaison concurrencée par vol)",
+    "Nombre trains en retard > 30min",
+    "Nombre trains en retard > 60min",
+    "Prct retard pour causes externes",
+    "Prct retard pour cause infrastructure",
+    "Prct retard pour cause gestion trafic",
+    "Prct retard pour cause matériel roulant",
+    "Prct retard pour cause gestion en gare et réutilisation de matériel",
+    "Prct retard pour cause prise en compte voyageurs (affluence, gestions PSH, correspondances)",
+]
+COMMENTS = [
+    "Heurt d’un chevreuil vers Valence-TGV",
+    "Dérangement de commutateur sur LN1 vers Tonnerre",
+    "Accident de personne sur la ligne à grande vitesse Atlantique",
+    "Panne d'alimentation électrique ; trafic interrompu 2h",
+]
+MULTILINE_COMMENT = (
+    "Ce mois-ci, l'OD a été touchée par les incidents suivants :\n"
+    "Le {day} : Dérangement du poste d’aiguillage de {station} ({trains} TGV ; {minutes}mn)"
+)
+# Numeric columns that may receive an injected negative or missing value.
+DIRTY_COLUMNS = [
+    "Durée moyenne du trajet",
+    "Nombre de circulations prévues",
+    "Nombre de trains en retard au départ",
+    "Retard moyen de tous les trains au départ",
+    "Retard moyen de tous les trains à l'arrivée",
+    "Prct retard pour cause infrastructure",
+]
+
+
+def generate_csv(
+    dst,
+    rows,
+    months=96,
+    start="2018-01",
+    seed=0,
+    comment_rate=0.05,
+    multiline_rate=0.02,
+    negative_rate=0.002,
+    null_rate=0.002,
+    malformed_rate=0.001,
+    chunk_rows=100_000,
+):
+    """Write a synthetic SNCF regularity CSV of about `rows` records to `dst`.
+
+    The file has the 26 columns and formatting of data/data.csv: one record
+    per route and month over `months` months from `start`, so the number of
+    routes grows with `rows` (station names come from data/locations.csv,
+    then synthetic "GARE nnnn" stations once those run out). Arrival delay
+    comments are added at `comment_rate`, and at `multiline_rate` as quoted
+    multi-line text with embedded separators. Rows with a negative or missing
+    numeric value, and malformed lines (no date, or a truncated record), are
+    injected at the given rates so that the cleaning steps have work to do.
+
+    Data is generated and written `chunk_rows` records at a time. Returns the
+    counts of what was written, by kind.
+    """
+    rng = np.random.default_rng(seed)
+    routes = -(-rows // months)
+    departures, arrivals = _route_stations(routes, rng)
+    services = np.where(rng.random(routes) < 0.12, "International", "National")
+    durations = rng.integers(50, 400, routes)
+    planned = rng.integers(40, 600, routes)
+    labels = pd.period_range(start, periods=months, freq="M").strftime("%Y-%m").to_numpy()
+    counts = {"records": 0, "multiline": 0, "negative": 0, "null": 0, "no_date": 0, "field_count": 0}
+
+    with open(dst, "w", encoding="utf-8-sig", newline="") as f:
+        f.write(";".join(COLUMNS) + "\n")
+        for begin in range(0, rows, chunk_rows):
+            index = np.arange(begin, min(begin + chunk_rows, rows))
+            route = index % routes
+            dates = labels[index // routes]
+            chunk = _chunk(rng, dates, services[route], departures[route], arrivals[route], durations[route], planned[route])
+            _inject(rng, chunk, counts, comment_rate, multiline_rate, negative_rate, null_rate)
+            chunk.to_csv(f, sep=";", header=False, index=False, lineterminator="\n")
+            counts["records"] += len(chunk)
+            f.writelines(_malformed(rng, chunk, counts, malformed_rate))
+    return counts
+
+
+def _route_stations(routes, rng):
+    """Departure and arrival station of `routes` distinct routes."""
+    names = list(pd.read_csv(config.locations_path(), encoding="utf-8-sig")["Gare"])
+    needed = int(np.ceil((1 + np.sqrt(1 + 4 * routes)) / 2))
+    names += [f"GARE {i:04d}" for i in range(needed - len(names))]
+    n = len(names)
+    pairs = rng.permutation(n * (n - 1))[:routes]
+    dep, arr = pairs // (n - 1), pairs % (n - 1)
+    arr = arr + (arr >= dep)
+    names = np.array(names, dtype=object)
+    return names[dep], names[arr]
+
+
+def _chunk(rng, dates, services, departures, arrivals, durations, planned):
+    n = len(dates)
+    planned = np.maximum(rng.poisson(planned), 1)
+    cancelled = rng.binomial(planned, 0.01)
+    running = np.maximum(planned - cancelled, 1)
+    late_dep = rng.binomial(running, 0.15)
+    late_arr = rng.binomial(running, 0.12)
+    late_dep_delay = rng.gamma(2.0, 6.0, n)
+    late_arr_delay = rng.gamma(3.0, 10.0, n)
+    all_arr_delay = late_arr_delay * late_arr / running
+    late15 = rng.binomial(late_arr, 0.5)
+    late30 = rng.binomial(late15, 0.5)
+    late60 = rng.binomial(late30, 0.4)
+    causes = rng.dirichlet(np.ones(6), n) * 100
+    empty = np.full(n, None, dtype=object)
+
+    values = [
+        dates, services, departures, arrivals, durations, planned, cancelled, empty,
+        late_dep, late_dep_delay, late_dep_delay * late_dep / running, empty.copy(),
+        late_arr, late_arr_delay, all_arr_delay, empty.copy(),
+        late15, all_arr_delay, late30, late60, *causes.T,
+    ]
+    chunk = pd.DataFrame(dict(zip(COLUMNS, values)))
+    return chunk.round(9)
+
+
+def _inject(rng, chunk, counts, comment_rate, multiline_rate, negative_rate, null_rate):
+    n = len(chunk)
+    comment = "Commentaire retards à l'arrivée"
+    draw = rng.random(n)
+    single = draw < comment_rate
+    chunk.loc[single, comment] = rng.choice(COMMENTS, single.sum())
+    multiline = (draw >= comment_rate) & (draw < comment_rate + multiline_rate)
+    chunk.loc[multiline, comment] = [
+        MULTILINE_COMMENT.format(day=rng.integers(1, 29), station=station, trains=rng.integers(2, 60), minutes=rng.integers(100, 3000))
+        for station in chunk.loc[multiline, "Gare de départ"]
+    ]
+    counts["multiline"] += int(multiline.sum())
+
+    for kind, rate in (("negative", negative_rate), ("null", null_rate)):
+        dirty = np.flatnonzero(rng.random(n) < rate)
+        columns = rng.choice(DIRTY_COLUMNS, len(dirty))
+        for col in DIRTY_COLUMNS:
+            rows = dirty[columns == col]
+            if kind == "negative":
+                chunk.iloc[rows, chunk.columns.get_loc(col)] = -1 - chunk[col].iloc[rows]
+            else:
+                if chunk[col].dtype.kind == "i":
+                    chunk[col] = chunk[col].astype("Int64")
+                chunk.iloc[rows, chunk.columns.get_loc(col)] = None
+        counts[kind] += len(dirty)
+
+
+def _malformed(rng, chunk, counts, malformed_rate):
+    """Lines load_data must reject: stray text without a date, or truncated records."""
+    lines = []
+    for _ in range(rng.binomial(len(chunk), malformed_rate)):
+        record = chunk.iloc[rng.integers(len(chunk))]
+        if rng.random() < 0.5:
+            lines.append(f"{rng.choice(COMMENTS)} ({record['Gare de départ']})\n")
+            counts["no_date"] += 1
+        else:
+            fields = record.iloc[: rng.integers(2, len(COLUMNS) - 1)].fillna("").astype(str).str.replace("\n", " ")
+            lines.append(";".join(fields) + "\n")
+            counts["field_count"] += 1
+    return lines
+
+
+def scale_csv(src, dst, factor, time_copies=2):
+    """Write a copy of the SNCF CSV `src` scaled `factor` times to `dst`.
+
+    Rows are replicated both over routes (station names get a numeric
+    suffix, creating new routes) and over months (dates are shifted by the
+    span of the source, creating new years), so that the number of groups
+    grows with the data. Quoted multi-line records and the header are kept
+    as in the source; lines the loader rejects are copied unchanged. The
+    source is re-read once per copy, so nothing is held in memory.
+    """
+    with open(src, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f, delimiter=";")
+        header = next(reader)
+        years = [int(row[0][:4]) for row in reader if row and row[0][:2] == "20" and row[0][4:5] == "-"]
+    span = max(years) - min(years) + 1
+    dep, arr = header.index("Gare de départ"), header.index("Gare d'arrivée")
+
+    with open(dst, "w", encoding="utf-8", newline="") as out:
+        writer = csv.writer(out, delimiter=";", lineterminator="\n")
+        writer.writerow(header)
+        for copy in range(factor):
+            suffix = f" {copy // time_copies}" if copy // time_copies else ""
+            shift = (copy % time_copies) * span
+            with open(src, "r", encoding="utf-8", newline="") as f:
+                reader = csv.reader(f, delimiter=";")
+                next(reader)
+                for row in reader:
+                    if len(row) == len(header):
+                        row[0] = f"{int(row[0][:4]) + shift}{row[0][4:]}" if row[0][:2] == "20" else row[0]
+                        row[dep] += suffix
+                        row[arr] += suffix
+                    writer.writerow(row)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic SNCF regularity CSV.")
+    parser.add_argument("output")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--months", type=int, default=96)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(generate_csv(args.output, args.rows, months=args.months, seed=args.seed))
@@ -1,11 +1,16 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-from Project import get_data
+from Project import get_data, get_memory_report, get_quality, get_quarantine_path, get_route_index, plotly_chart, timing_panel
+from util import timing
+from util.lazy import lazy_import
+
+px = lazy_import("plotly.express")
+
 st.set_page_config(page_title="Data Cleaning", page_icon="🧹", layout="wide")
+timing.start_page("Data Cleaning")
 
 df = get_data()
+quality = get_quality()
 
 st.title("🧹 Data Cleaning & Preparation")
 st.markdown("### Transforming Raw Data into Actionable Insights")
@@ -107,6 +112,49 @@ numeric_cols = ['Retard moyen de tous les trains au départ', 'Retard moyen de t
 df[numeric_cols] = df[numeric_cols].astype(float)
 """, language="python")
 
+st.markdown("**Compact Storage Schema:**")
+
+st.markdown("""
+Stations, services and delay comments are stored as categoricals (both station columns 
+share a single dictionary), counts are downcast to the smallest integer type that fits 
+and cause percentages are stored as `float32`.
+""")
+
+memory = get_memory_report()
+default_kb = memory["Default (KB)"].sum()
+schema_kb = memory["Schema (KB)"].sum()
+
+col1, col2, col3 = st.columns(3)
+
+with col1:
+    st.metric("Default dtypes", f"{default_kb / 1024:.2f} MB")
+with col2:
+    st.metric("Compact schema", f"{schema_kb / 1024:.2f} MB")
+with col3:
+    st.metric("Memory Saved", f"{(1 - schema_kb / default_kb) * 100:.1f}%")
+
+st.dataframe(
+    memory,
+    use_container_width=True,
+    hide_index=True,
+    column_config={
+        "Column": st.column_config.TextColumn("Column Name", width="large"),
+        "Default Type": st.column_config.TextColumn("Default Type", width="small"),
+        "Schema Type": st.column_config.TextColumn("Schema Type", width="small"),
+        "Default (KB)": st.column_config.NumberColumn("Default (KB)", format="%.1f"),
+        "Schema (KB)": st.column_config.NumberColumn("Schema (KB)", format="%.1f")
+    }
+)
+
+st.code("""
+stations = pd.concat([df['Gare de départ'], df['Gare d\'arrivée']]).dropna().unique()
+station_dtype = pd.CategoricalDtype(sorted(stations))
+df[['Gare de départ', 'Gare d\'arrivée']] = df[['Gare de départ', 'Gare d\'arrivée']].astype(station_dtype)
+df['Service'] = df['Service'].astype('category')
+df[count_cols] = df[count_cols].apply(pd.to_numeric, downcast='integer')
+df[percent_cols] = df[percent_cols].astype('float32')
+""", language="python")
+
 st.markdown("---")
 
 st.header("📅 Step 2: Temporal Feature Engineering")
@@ -403,16 +451,55 @@ st.markdown("""
 **Objective:** Identify and handle missing values, outliers, and data inconsistencies.
 """)
 
+st.markdown("**Rejected Records:**")
+
+col1, col2, col3, col4 = st.columns(4)
+
+with col1:
+    st.metric("Multi-line Records Recovered", f"{quality['records_recovered']:,}",
+              help="Records whose quoted comment spans several lines, joined back before parsing")
+with col2:
+    st.metric("Malformed Records Skipped", f"{quality['lines_rejected']:,}",
+              help="Records not starting with a YYYY-MM date or with the wrong number of fields")
+with col3:
+    st.metric("Rows Rejected", f"{quality['rows_rejected']:,}",
+              help="Rows dropped because a numeric field was negative or missing (see the table below)")
+with col4:
+    st.metric("Records Retained", f"{quality['rows']:,}")
+
+if quality["lines_rejected"] > 0:
+    st.caption(
+        "Skipped records by reason: "
+        + ", ".join(f"`{reason}` {n:,}" for reason, n in quality["rejected_by_reason"].items())
+        + f" — full text quarantined in `{get_quarantine_path()}`"
+    )
+
+rejects = pd.DataFrame({
+    "Negative Values": quality["negative_rejects"],
+    "Missing Values": quality["null_rejects"],
+}).fillna(0).astype("int64").rename_axis("Column").reset_index()
+
+if len(rejects) > 0:
+    st.dataframe(
+        rejects,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "Column": st.column_config.TextColumn("Column Name", width="large"),
+            "Negative Values": st.column_config.NumberColumn("Negative (Rows Dropped)", format="%d"),
+            "Missing Values": st.column_config.NumberColumn("Missing (Rows Dropped)", format="%d")
+        }
+    )
+    st.caption("A row with several negative or missing fields is counted in each of them.")
+
 st.markdown("**Missing Value Analysis:**")
 
 missing_data = pd.DataFrame({
-    "Column": df.columns,
-    "Missing Count": [df[col].isna().sum() for col in df.columns],
-    "Missing Percentage": [f"{(df[col].isna().sum() / len(df) * 100):.2f}%" for col in df.columns]
+    "Column": quality["nulls"].index,
+    "Missing Count": quality["nulls"].values,
+    "Missing Percentage": [f"{n / quality['rows'] * 100:.2f}%" for n in quality["nulls"].values]
 })
 
-missing_data = missing_data[missing_data['Missing Count'] > 0].sort_values('Missing Count', ascending=False)
-
 if len(missing_data) > 0:
     st.dataframe(
         missing_data.reset_index(drop=True),
@@ -445,20 +532,14 @@ with col1:
         labels={'Retard moyen de tous les trains à l\'arrivée': 'Average Delay (minutes)'}
     )
     fig_box.update_layout(height=400, showlegend=False)
-    st.plotly_chart(fig_box, use_container_width=True)
+    plotly_chart(fig_box, use_container_width=True)
 
 with col2:
-    Q1 = df['Retard moyen de tous les trains à l\'arrivée'].quantile(0.25)
-    Q3 = df['Retard moyen de tous les trains à l\'arrivée'].quantile(0.75)
-    IQR = Q3 - Q1
-    outliers = df[
-        (df['Retard moyen de tous les trains à l\'arrivée'] < (Q1 - 1.5 * IQR)) |
-        (df['Retard moyen de tous les trains à l\'arrivée'] > (Q3 + 1.5 * IQR))
-    ]
-    
-    st.metric("Total Records", f"{len(df):,}")
-    st.metric("Outliers Detected", f"{len(outliers):,}")
-    st.metric("Outlier Percentage", f"{(len(outliers) / len(df) * 100):.2f}%")
+    outliers = quality["outliers"]
+
+    st.metric("Total Records", f"{quality['rows']:,}")
+    st.metric("Outliers Detected", f"{outliers['count']:,}")
+    st.metric("Outlier Percentage", f"{(outliers['count'] / quality['rows'] * 100):.2f}%")
     
     st.info("""
     **Decision:** Outliers were retained as they represent genuine extreme delay events 
@@ -516,7 +597,9 @@ with col1:
 
 with col2:
     st.metric("Date Range", f"{(df['Date'].max() - df['Date'].min()).days} days")
-    st.metric("Unique Routes", df.groupby(['Gare de départ', 'Gare d\'arrivée']).ngroups)
+    with timing.timed("unique routes"):
+        unique_routes = len(get_route_index().routes)
+    st.metric("Unique Routes", unique_routes)
 
 with col3:
     st.metric("Total Services", f"{df['Nombre de circulations prévues'].sum():,}")
@@ -538,4 +621,6 @@ st.dataframe(
     df[available_cols].head(10),
     use_container_width=True,
     hide_index=True
-)
\ No newline at end of file
+)
+
+timing_panel()
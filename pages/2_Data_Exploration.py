@@ -1,10 +1,12 @@
 import streamlit as st
 import plotly.express as px
-from Project import get_data, get_station_coord
-from geopy.geocoders import Nominatim
-from geopy.extra.rate_limiter import RateLimiter
-import pandas as pd
+from Project import get_data, get_rollups, get_route_index, get_station_series, get_stations, plotly_chart, timing_panel
+from util import queries, timing
+from util.timeseries import CENTERED_CHART_WIDTH, chart_points, downsample
+
+timing.start_page("Data Exploration")
 df = get_data()
+cube = get_rollups()
 
 st.title("📊 Data exploration")
 st.markdown("---")
@@ -12,11 +14,8 @@ st.markdown("---")
 
 st.header("🔹 Delayed trains by month")
 
-df_monthly = (
-    df.groupby('Date', as_index=False)['Nombre de trains en retard au départ']
-    .sum()
-    .sort_values('Date')
-)
+with timing.timed("monthly series"):
+    df_monthly = queries.monthly_series(cube)
 
 fig_hist = px.bar(
     df_monthly, 
@@ -25,33 +24,24 @@ fig_hist = px.bar(
     title='Distribution des retards mensuels'
 )
 
-st.plotly_chart(fig_hist, use_container_width=True)
+plotly_chart(fig_hist, use_container_width=True)
 
 
 st.header("🔹 Canceled train by month")
 
-df_annules = df.groupby('Date', as_index=False)['Nombre de trains annulés'].sum()
-
 fig_annules = px.bar(
-    df_annules,
+    df_monthly,
     x='Date',
     y='Nombre de trains annulés',
     title='Nombre de trains annulés par mois'
 )
 
-st.plotly_chart(fig_annules, use_container_width=True)
+plotly_chart(fig_annules, use_container_width=True)
 
 st.header("🔹 10 most most delayed station")
 
-df_retards = (
-    df.groupby(['Gare de départ', 'Gare d\'arrivée'], as_index=False)['Retard moyen de tous les trains à l\'arrivée']
-    .mean()
-    .sort_values('Retard moyen de tous les trains à l\'arrivée', ascending=False)
-    .head(10)
-)
-
-# Créer une colonne pour les labels
-df_retards['Ligne'] = df_retards['Gare de départ'] + " → " + df_retards['Gare d\'arrivée']
+with timing.timed("top 10 delayed routes"):
+    df_retards = queries.top_delayed_routes(10, cube)
 
 fig_top10 = px.bar(
     df_retards,
@@ -61,34 +51,28 @@ fig_top10 = px.bar(
     title='🚆 Top 10 des lignes avec le plus de retard moyen à l\'arrivée'
 )
 
-st.plotly_chart(fig_top10, use_container_width=True)
+plotly_chart(fig_top10, use_container_width=True)
 
 st.header("🔹 Average delay by routes")
 
+with timing.timed("average delay by month"):
+    df_delay = downsample(df_monthly, 'Date', 'Retard moyen de tous les trains à l\'arrivée', chart_points(CENTERED_CHART_WIDTH))
+
 fig1 = px.line(
-    df.groupby('Date', as_index=False)['Retard moyen de tous les trains à l\'arrivée'].mean(),
+    df_delay,
     x='Date',
     y='Retard moyen de tous les trains à l\'arrivée',
     title='Évolution du retard moyen à l’arrivée (tous services confondus)',
     markers=True
 )
-st.plotly_chart(fig1, use_container_width=True)
+plotly_chart(fig1, use_container_width=True)
 
 
 st.header("🔹 Delays causes")
 
-cols_causes = [
-    'Prct retard pour causes externes',
-    'Prct retard pour cause infrastructure',
-    'Prct retard pour cause gestion trafic',
-    'Prct retard pour cause matériel roulant',
-    'Prct retard pour cause gestion en gare et réutilisation de matériel',
-    'Prct retard pour cause prise en compte voyageurs (affluence, gestions PSH, correspondances)'
-]
-
 # Moyenne de chaque cause sur l'ensemble du dataset
-mean_causes = df[cols_causes].mean().reset_index()
-mean_causes.columns = ['Cause', 'Pourcentage']
+with timing.timed("mean delay causes"):
+    mean_causes = queries.mean_causes(cube)
 
 fig5 = px.pie(
     mean_causes,
@@ -96,14 +80,16 @@ fig5 = px.pie(
     values='Pourcentage',
     title='Répartition moyenne des causes de retard'
 )
-st.plotly_chart(fig5, use_container_width=True)
+plotly_chart(fig5, use_container_width=True)
 
 selected_line = st.selectbox(
     "🚄 Select a route :", 
-    sorted(df['Gare de départ'].unique())
+    sorted(get_route_index().routes['Gare de départ'].unique())
 )
 
-filtered_df = df[df['Gare de départ'] == selected_line]
+# Average over the routes leaving the station, downsampled to the chart width
+with timing.timed("station series"):
+    filtered_df = get_station_series(selected_line, CENTERED_CHART_WIDTH)
 
 fig = px.line(
     filtered_df,
@@ -113,23 +99,11 @@ fig = px.line(
     markers=True
 )
 
-st.plotly_chart(fig, use_container_width=True)
+plotly_chart(fig, use_container_width=True)
+st.caption("Average arrival delay per date over all the routes leaving the selected station.")
 
-avg_delay = (
-    df.groupby("Gare de départ", as_index=False)["Retard moyen de tous les trains à l'arrivée"]
-    .mean()
-    .rename(columns={"Retard moyen de tous les trains à l'arrivée": "Retard moyen"})
-)
-
-locations = get_station_coord()
-coord_dict = locations.set_index("Gare")[["lat", "lon"]].to_dict(orient="index")
-
-retard_par_gare = df.groupby("Gare de départ")["Retard moyen de tous les trains au départ"].mean().reset_index()
-
-retard_par_gare["lat"] = retard_par_gare["Gare de départ"].apply(lambda x: coord_dict[x]["lat"] if x in coord_dict else None)
-retard_par_gare["lon"] = retard_par_gare["Gare de départ"].apply(lambda x: coord_dict[x]["lon"] if x in coord_dict else None)
-
-retard_par_gare = retard_par_gare.dropna(subset=["lat", "lon"])
+with timing.timed("delay by station"):
+    retard_par_gare = queries.station_delays(cube, get_stations()).dropna(subset=["lat", "lon"])
 
 st.title("Average delay by stations")
 
@@ -146,7 +120,6 @@ fig = px.scatter_mapbox(
     mapbox_style="carto-positron"
 )
 
-st.plotly_chart(fig, use_container_width=True)
-
-retard_par_gare_not_null = df.groupby("Gare de départ")["Retard moyen de tous les trains au départ" > 0].mean().reset_index()
+plotly_chart(fig, use_container_width=True)
 
+timing_panel()
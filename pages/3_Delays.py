@@ -1,33 +1,16 @@
 import streamlit as st
-import pandas as pd
 import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
-from Project import get_data, get_station_coord
-import numpy as np
+from Project import cached_figure, get_data, get_rollups, plotly_chart, timing_panel
+from util import queries, timing
+from util.lazy import lazy_import
+
+plotly_subplots = lazy_import("plotly.subplots")
 
 st.set_page_config(page_title="Deep Dive Analysis", page_icon="🔍", layout="wide")
+timing.start_page("Delays")
 
 df = get_data()
-
-
-# Extract temporal features
-df['Year'] = df['Date'].dt.year
-df['Month'] = df['Date'].dt.month
-df['Month_Name'] = df['Date'].dt.strftime('%B')
-df['Quarter'] = df['Date'].dt.quarter
-df['Season'] = df['Month'].map({
-    12: 'Winter', 1: 'Winter', 2: 'Winter',
-    3: 'Spring', 4: 'Spring', 5: 'Spring',
-    6: 'Summer', 7: 'Summer', 8: 'Summer',
-    9: 'Fall', 10: 'Fall', 11: 'Fall'
-})
-
-# Calculate key metrics
-df['Punctuality_Rate'] = 100 - (df['Nombre de trains en retard à l\'arrivée'] / 
-                                 df['Nombre de circulations prévues'] * 100)
-df['Cancellation_Rate'] = (df['Nombre de trains annulés'] / 
-                           df['Nombre de circulations prévues'] * 100)
+cube = get_rollups()
 
 st.markdown("""
 <div style='background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
@@ -91,83 +74,77 @@ First, let's examine how average delays evolve throughout the year. The pattern
 """)
 
 # Monthly trend
-monthly_stats = df.groupby('Month').agg({
-    'Retard moyen de tous les trains à l\'arrivée': 'mean',
-    'Nombre de circulations prévues': 'sum',
-    'Nombre de trains en retard à l\'arrivée': 'sum',
-    'Punctuality_Rate': 'mean'
-}).reset_index()
-
-month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 
-               'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-monthly_stats['Month_Name'] = monthly_stats['Month'].map(
-    dict(zip(range(1, 13), month_names))
-)
-
-fig1 = make_subplots(
-    rows=2, cols=1,
-    subplot_titles=('Average Delay by Month', 'Punctuality Rate by Month'),
-    vertical_spacing=0.15,
-    specs=[[{"secondary_y": False}], [{"secondary_y": False}]]
-)
-
-# Top plot: Average delay
-fig1.add_trace(
-    go.Bar(
-        x=monthly_stats['Month_Name'],
-        y=monthly_stats['Retard moyen de tous les trains à l\'arrivée'],
-        marker=dict(
-            color=monthly_stats['Retard moyen de tous les trains à l\'arrivée'],
-            colorscale='Reds',
-            showscale=False
+with timing.timed("monthly trend"):
+    monthly_stats = queries.monthly_profile(cube)
+
+def build_monthly_figure():
+    fig1 = plotly_subplots.make_subplots(
+        rows=2, cols=1,
+        subplot_titles=('Average Delay by Month', 'Punctuality Rate by Month'),
+        vertical_spacing=0.15,
+        specs=[[{"secondary_y": False}], [{"secondary_y": False}]]
+    )
+
+    # Top plot: Average delay
+    fig1.add_trace(
+        go.Bar(
+            x=monthly_stats['Month_Name'],
+            y=monthly_stats['Retard moyen de tous les trains à l\'arrivée'],
+            marker=dict(
+                color=monthly_stats['Retard moyen de tous les trains à l\'arrivée'],
+                colorscale='Reds',
+                showscale=False
+            ),
+            text=monthly_stats['Retard moyen de tous les trains à l\'arrivée'].round(2),
+            textposition='outside',
+            name='Avg Delay',
+            hovertemplate='<b>%{x}</b><br>Avg Delay: %{y:.2f} min<extra></extra>'
+        ),
+        row=1, col=1
+    )
+
+    fig1.add_vrect(
+        x0=5.5, x1=8.5, 
+        fillcolor="orange", opacity=0.2, 
+        annotation_text="SUMMER", annotation_position="top left",
+        row=1, col=1
+    )
+
+    fig1.add_trace(
+        go.Scatter(
+            x=monthly_stats['Month_Name'],
+            y=monthly_stats['Punctuality_Rate'],
+            mode='lines+markers',
+            marker=dict(size=10, color='#4CAF50'),
+            line=dict(width=3, color='#4CAF50'),
+            name='Punctuality',
+            hovertemplate='<b>%{x}</b><br>Punctuality: %{y:.1f}%<extra></extra>'
         ),
-        text=monthly_stats['Retard moyen de tous les trains à l\'arrivée'].round(2),
-        textposition='outside',
-        name='Avg Delay',
-        hovertemplate='<b>%{x}</b><br>Avg Delay: %{y:.2f} min<extra></extra>'
-    ),
-    row=1, col=1
-)
-
-fig1.add_vrect(
-    x0=5.5, x1=8.5, 
-    fillcolor="orange", opacity=0.2, 
-    annotation_text="SUMMER", annotation_position="top left",
-    row=1, col=1
-)
-
-fig1.add_trace(
-    go.Scatter(
-        x=monthly_stats['Month_Name'],
-        y=monthly_stats['Punctuality_Rate'],
-        mode='lines+markers',
-        marker=dict(size=10, color='#4CAF50'),
-        line=dict(width=3, color='#4CAF50'),
-        name='Punctuality',
-        hovertemplate='<b>%{x}</b><br>Punctuality: %{y:.1f}%<extra></extra>'
-    ),
-    row=2, col=1
-)
-
-fig1.add_hline(
-    y=85, line_dash="dash", line_color="red",
-    annotation_text="Target: 85%", annotation_position="right",
-    row=2, col=1
-)
-
-fig1.add_vrect(
-    x0=5.5, x1=8.5, 
-    fillcolor="orange", opacity=0.2,
-    row=2, col=1
-)
-
-fig1.update_xaxes(title_text="Month", row=2, col=1)
-fig1.update_yaxes(title_text="Average Delay (minutes)", row=1, col=1)
-fig1.update_yaxes(title_text="Punctuality Rate (%)", row=2, col=1)
-
-fig1.update_layout(height=700, showlegend=False, template='plotly_white')
-
-st.plotly_chart(fig1, use_container_width=True)
+        row=2, col=1
+    )
+
+    fig1.add_hline(
+        y=85, line_dash="dash", line_color="red",
+        annotation_text="Target: 85%", annotation_position="right",
+        row=2, col=1
+    )
+
+    fig1.add_vrect(
+        x0=5.5, x1=8.5, 
+        fillcolor="orange", opacity=0.2,
+        row=2, col=1
+    )
+
+    fig1.update_xaxes(title_text="Month", row=2, col=1)
+    fig1.update_yaxes(title_text="Average Delay (minutes)", row=1, col=1)
+    fig1.update_yaxes(title_text="Punctuality Rate (%)", row=2, col=1)
+
+    fig1.update_layout(height=700, showlegend=False, template='plotly_white')
+    return fig1
+
+fig1 = cached_figure("monthly trend", build_monthly_figure)
+
+plotly_chart(fig1, use_container_width=True)
 
 # Key statistics
 st.markdown("### 📈 Key Statistics")
@@ -218,65 +195,50 @@ While the summer effect is widespread, some routes experience much more dramatic
 Let's identify the most vulnerable connections.
 """)
 
-route_seasonal = df.groupby(['Gare de départ', 'Gare d\'arrivée', 'Season']).agg({
-    'Retard moyen de tous les trains à l\'arrivée': 'mean',
-    'Nombre de circulations prévues': 'sum'
-}).reset_index()
-
-route_pivot = route_seasonal.pivot_table(
-    index=['Gare de départ', 'Gare d\'arrivée'],
-    columns='Season',
-    values='Retard moyen de tous les trains à l\'arrivée',
-    aggfunc='mean'
-).reset_index()
-
-if 'Summer' in route_pivot.columns and 'Winter' in route_pivot.columns:
-    route_pivot['Summer_Impact'] = route_pivot['Summer'] - route_pivot['Winter']
-    route_pivot['Impact_Pct'] = (route_pivot['Summer_Impact'] / route_pivot['Winter'] * 100)
-    
-    # Filter routes with significant traffic
-    route_traffic = df.groupby(['Gare de départ', 'Gare d\'arrivée'])['Nombre de circulations prévues'].sum()
-    significant_routes = route_traffic[route_traffic > route_traffic.quantile(0.75)].index
-    
-    route_pivot = route_pivot.set_index(['Gare de départ', 'Gare d\'arrivée'])
-    route_pivot = route_pivot.loc[route_pivot.index.isin(significant_routes)].reset_index()
-    
+with timing.timed("route seasonal pivot"):
+    route_pivot = queries.route_seasonal_impact(cube)
+
+if 'Summer_Impact' in route_pivot.columns:
     # Top 15 most affected routes
     top_affected = route_pivot.nlargest(15, 'Summer_Impact')
     top_affected['Route'] = top_affected['Gare de départ'].str[:15] + ' → ' + top_affected['Gare d\'arrivée'].str[:15]
     
-    fig2 = go.Figure()
-    
-    fig2.add_trace(go.Bar(
-        y=top_affected['Route'],
-        x=top_affected['Winter'],
-        name='Winter Delay',
-        orientation='h',
-        marker=dict(color='#2196F3'),
-        hovertemplate='<b>%{y}</b><br>Winter: %{x:.2f} min<extra></extra>'
-    ))
-    
-    fig2.add_trace(go.Bar(
-        y=top_affected['Route'],
-        x=top_affected['Summer'],
-        name='Summer Delay',
-        orientation='h',
-        marker=dict(color='#FF5722'),
-        hovertemplate='<b>%{y}</b><br>Summer: %{x:.2f} min<extra></extra>'
-    ))
-    
-    fig2.update_layout(
-        title='Top 15 Routes Most Affected by Summer Delays',
-        xaxis_title='Average Delay (minutes)',
-        yaxis_title='Route',
-        barmode='group',
-        height=600,
-        template='plotly_white',
-        showlegend=True,
-        legend=dict(x=0.7, y=0.98)
-    )
-    
-    st.plotly_chart(fig2, use_container_width=True)
+    def build_affected_routes_figure():
+        fig2 = go.Figure()
+
+        fig2.add_trace(go.Bar(
+            y=top_affected['Route'],
+            x=top_affected['Winter'],
+            name='Winter Delay',
+            orientation='h',
+            marker=dict(color='#2196F3'),
+            hovertemplate='<b>%{y}</b><br>Winter: %{x:.2f} min<extra></extra>'
+        ))
+
+        fig2.add_trace(go.Bar(
+            y=top_affected['Route'],
+            x=top_affected['Summer'],
+            name='Summer Delay',
+            orientation='h',
+            marker=dict(color='#FF5722'),
+            hovertemplate='<b>%{y}</b><br>Summer: %{x:.2f} min<extra></extra>'
+        ))
+
+        fig2.update_layout(
+            title='Top 15 Routes Most Affected by Summer Delays',
+            xaxis_title='Average Delay (minutes)',
+            yaxis_title='Route',
+            barmode='group',
+            height=600,
+            template='plotly_white',
+            showlegend=True,
+            legend=dict(x=0.7, y=0.98)
+        )
+        return fig2
+
+    fig2 = cached_figure("most affected routes", build_affected_routes_figure)
+
+    plotly_chart(fig2, use_container_width=True)
     
     # Insights
     st.warning(f"""
@@ -296,60 +258,45 @@ shift seasonally.
 """)
 
 # Calculate cause breakdown by season
-cause_columns = [
-    'Prct retard pour causes externes',
-    'Prct retard pour cause infrastructure',
-    'Prct retard pour cause gestion trafic',
-    'Prct retard pour cause matériel roulant',
-    'Prct retard pour cause gestion en gare et réutilisation de matériel',
-    'Prct retard pour cause prise en compte voyageurs (affluence, gestions PSH, correspondances)'
-]
-
-# Rename for clarity
-cause_names = {
-    'Prct retard pour causes externes': 'External (Weather, etc.)',
-    'Prct retard pour cause infrastructure': 'Infrastructure',
-    'Prct retard pour cause gestion trafic': 'Traffic Management',
-    'Prct retard pour cause matériel roulant': 'Rolling Stock',
-    'Prct retard pour cause gestion en gare et réutilisation de matériel': 'Station Management',
-    'Prct retard pour cause prise en compte voyageurs (affluence, gestions PSH, correspondances)': 'Passenger Handling'
-}
-
-seasonal_causes = df.groupby('Season')[cause_columns].mean().T
-seasonal_causes.index = [cause_names[col] for col in cause_columns]
-
-fig3 = go.Figure()
-
-seasons = ['Winter', 'Spring', 'Summer', 'Fall']
-colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8', '#F7DC6F']
-
-for i, cause in enumerate(seasonal_causes.index):
-    fig3.add_trace(go.Bar(
-        name=cause,
-        x=seasons,
-        y=[seasonal_causes.loc[cause, season] if season in seasonal_causes.columns else 0 
-           for season in seasons],
-        marker_color=colors[i],
-        hovertemplate='<b>%{fullData.name}</b><br>%{y:.1f}%<extra></extra>'
-    ))
-
-fig3.update_layout(
-    title='Delay Cause Attribution by Season',
-    xaxis_title='Season',
-    yaxis_title='Percentage of Total Delay Time (%)',
-    barmode='stack',
-    height=500,
-    template='plotly_white',
-    legend=dict(
-        orientation="h",
-        yanchor="bottom",
-        y=-0.3,
-        xanchor="center",
-        x=0.5
+with timing.timed("seasonal causes"):
+    seasonal_causes = queries.seasonal_causes(cube)
+
+def build_seasonal_causes_figure():
+    fig3 = go.Figure()
+
+    seasons = ['Winter', 'Spring', 'Summer', 'Fall']
+    colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8', '#F7DC6F']
+
+    for i, cause in enumerate(seasonal_causes.index):
+        fig3.add_trace(go.Bar(
+            name=cause,
+            x=seasons,
+            y=[seasonal_causes.loc[cause, season] if season in seasonal_causes.columns else 0 
+               for season in seasons],
+            marker_color=colors[i],
+            hovertemplate='<b>%{fullData.name}</b><br>%{y:.1f}%<extra></extra>'
+        ))
+
+    fig3.update_layout(
+        title='Delay Cause Attribution by Season',
+        xaxis_title='Season',
+        yaxis_title='Percentage of Total Delay Time (%)',
+        barmode='stack',
+        height=500,
+        template='plotly_white',
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=-0.3,
+            xanchor="center",
+            x=0.5
+        )
     )
-)
+    return fig3
+
+fig3 = cached_figure("seasonal causes", build_seasonal_causes_figure)
 
-st.plotly_chart(fig3, use_container_width=True)
+plotly_chart(fig3, use_container_width=True)
 
 # Analysis by cause
 col1, col2 = st.columns(2)
@@ -393,50 +340,36 @@ reputation damage, and operational inefficiencies.
 """)
 
 # Calculate impact metrics
-summer_data = df[df['Season'] == 'Summer']
-winter_data = df[df['Season'] == 'Winter']
-
-total_summer_delays = (summer_data['Retard moyen de tous les trains à l\'arrivée'] * 
-                       summer_data['Nombre de circulations prévues']).sum()
-total_winter_delays = (winter_data['Retard moyen de tous les trains à l\'arrivée'] * 
-                       winter_data['Nombre de circulations prévues']).sum()
-
-excess_delay_minutes = total_summer_delays - (total_winter_delays / len(winter_data) * len(summer_data))
+with timing.timed("summer impact"):
+    impact = queries.summer_impact(df)
 
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
     st.metric(
         "Excess Delay Minutes",
-        f"{excess_delay_minutes:,.0f}",
+        f"{impact['excess_delay_minutes']:,.0f}",
         help="Additional delay minutes in summer vs winter baseline"
     )
 
 with col2:
-    passengers_affected = summer_data['Nombre de circulations prévues'].sum()
     st.metric(
         "Summer Passengers",
-        f"{passengers_affected:,.0f}",
+        f"{impact['summer_services']:,.0f}",
         help="Total train services during summer months"
     )
 
 with col3:
-    avg_passengers_per_train = 300  # Assumption
-    total_passenger_hours = (excess_delay_minutes * avg_passengers_per_train) / 60
     st.metric(
         "Lost Passenger Hours",
-        f"{total_passenger_hours:,.0f}",
+        f"{impact['passenger_hours_lost']:,.0f}",
         help="Estimated total passenger time lost"
     )
 
 with col4:
-    compensation_threshold = 30  # minutes
-    trains_over_threshold = summer_data[
-        summer_data['Retard moyen de tous les trains à l\'arrivée'] > compensation_threshold
-    ]['Nombre de circulations prévues'].sum()
     st.metric(
         "Compensation Risk",
-        f"{trains_over_threshold:,.0f}",
+        f"{impact['compensation_risk']:,.0f}",
         help="Trains exceeding compensation threshold"
     )
 
@@ -478,33 +411,38 @@ st.markdown("---")
 st.subheader("📅 Delay Heatmap: Month vs Year")
 
 if 'Year' in df.columns and 'Month' in df.columns:
-    heatmap_data = df.groupby(['Year', 'Month'])['Retard moyen de tous les trains à l\'arrivée'].mean().reset_index()
-    heatmap_pivot = heatmap_data.pivot(index='Month', columns='Year', 
-                                       values='Retard moyen de tous les trains à l\'arrivée')
-    
-    fig4 = go.Figure(data=go.Heatmap(
-        z=heatmap_pivot.values,
-        x=heatmap_pivot.columns,
-        y=[month_names[int(m)-1] for m in heatmap_pivot.index],
-        colorscale='RdYlGn_r',
-        text=heatmap_pivot.values.round(2),
-        texttemplate='%{text}',
-        textfont={"size": 10},
-        colorbar=dict(title="Avg Delay<br>(minutes)")
-    ))
+    with timing.timed("delay heatmap"):
+        heatmap_pivot = queries.delay_heatmap(cube)
     
-    fig4.update_layout(
-        title='Historical Delay Pattern: Consistent Summer Peaks',
-        xaxis_title='Year',
-        yaxis_title='Month',
-        height=500,
-        template='plotly_white'
-    )
-    
-    st.plotly_chart(fig4, use_container_width=True)
+    def build_heatmap_figure():
+        fig4 = go.Figure(data=go.Heatmap(
+            z=heatmap_pivot.values,
+            x=heatmap_pivot.columns,
+            y=[queries.MONTH_NAMES[int(m)-1] for m in heatmap_pivot.index],
+            colorscale='RdYlGn_r',
+            text=heatmap_pivot.values.round(2),
+            texttemplate='%{text}',
+            textfont={"size": 10},
+            colorbar=dict(title="Avg Delay<br>(minutes)")
+        ))
+
+        fig4.update_layout(
+            title='Historical Delay Pattern: Consistent Summer Peaks',
+            xaxis_title='Year',
+            yaxis_title='Month',
+            height=500,
+            template='plotly_white'
+        )
+        return fig4
+
+    fig4 = cached_figure("delay heatmap", build_heatmap_figure)
+
+    plotly_chart(fig4, use_container_width=True)
 
 st.success("""
 **🎓 Final Thought:** Understanding seasonal patterns is the first step toward operational 
 excellence. By anticipating summer stress points, SNCF can transform this predictable 
 challenge into an opportunity for differentiation and customer satisfaction.
-""")
\ No newline at end of file
+""")
+
+timing_panel()
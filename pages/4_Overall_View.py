@@ -1,55 +1,27 @@
 import streamlit as st
 import plotly.graph_objects as go
-import pandas as pd
-from Project import get_data, get_locations, get_station_coord
+from Project import cached_figure, get_data, get_rollups, get_route_segments, get_routes, get_stations, plotly_chart, timing_panel
+from util import queries, timing
+from util.stations import missing_coordinates
+from util.viz import hover_template
 
 
 st.set_page_config(page_title="Overall View", page_icon="🔍", layout="wide")
+timing.start_page("Overall View")
 df = get_data()
+cube = get_rollups()
 
-# Load station coordinates
-locations = get_station_coord()  # DataFrame with columns: Gare, lat, lon
-coord_dict = locations.set_index("Gare")[["lat", "lon"]].to_dict(orient="index")
+# Station dimension table with columns: lat, lon, indexed by Gare
+stations = get_stations()
 
-stats_by_station = df.groupby("Gare de départ").agg({
-    "Retard moyen de tous les trains au départ": ["mean", "std"],
-    "Nombre de circulations prévues": "sum",
-    "Nombre de trains annulés": "sum",
-    "Nombre de trains en retard au départ": "sum",
-    "Retard moyen des trains en retard au départ": "mean"
-}).reset_index()
+with timing.timed("station statistics"):
+    stats_by_station = queries.station_stats(cube, stations)
 
-stats_by_station.columns = [
-    "Station",
-    "Average Delay",
-    "Delay Std Dev",
-    "Total Services",
-    "Total Cancellations",
-    "Total Delayed Trains",
-    "Avg Delay of Delayed Trains"
-]
-
-# Calculate cancellation and punctuality rates
-stats_by_station["Cancellation Rate (%)"] = (
-    stats_by_station["Total Cancellations"] / stats_by_station["Total Services"] * 100
-).round(2)
-
-stats_by_station["Punctuality Rate (%)"] = (
-    100 - (stats_by_station["Total Delayed Trains"] / stats_by_station["Total Services"] * 100)
-).round(2)
-
-# Add GPS coordinates
-stats_by_station["lat"] = stats_by_station["Station"].map(
-    lambda x: coord_dict.get(x, {}).get("lat", None)
-)
-stats_by_station["lon"] = stats_by_station["Station"].map(
-    lambda x: coord_dict.get(x, {}).get("lon", None)
-)
-
-stations_without_coords = stats_by_station[stats_by_station["lat"].isna()]
+stations_without_coords = missing_coordinates(stations, stats_by_station["Station"])
 if len(stations_without_coords) > 0:
     with st.expander(f"⚠️ {len(stations_without_coords)} station(s) without GPS coordinates"):
-        st.write(stations_without_coords["Station"].tolist())
+        st.write(stations_without_coords)
+        st.caption("Resolve them offline against a station gazetteer with `python -m util.geocode <gazetteer.csv>`.")
 
 stats_by_station = stats_by_station.dropna(subset=["lat", "lon"])
 
@@ -64,7 +36,8 @@ def categorize_delay(delay):
     else:
         return "🔴 Needs Improvement (> 10 min)"
 
-stats_by_station["Category"] = stats_by_station["Average Delay"].apply(categorize_delay)
+with timing.timed("delay categories"):
+    stats_by_station["Category"] = stats_by_station["Average Delay"].apply(categorize_delay)
 
 
 st.title("🗺️ Interactive Delay Map by Departure Station")
@@ -123,12 +96,13 @@ with col_slider3:
     )
 
 # Apply filters
-filtered_data = stats_by_station[
-    (stats_by_station["Average Delay"] >= delay_range[0]) &
-    (stats_by_station["Average Delay"] <= delay_range[1]) &
-    (stats_by_station["Total Services"] >= min_services) &
-    (stats_by_station["Category"].isin(categories_filter))
-].copy()
+with timing.timed("map filters"):
+    filtered_data = stats_by_station[
+        (stats_by_station["Average Delay"] >= delay_range[0]) &
+        (stats_by_station["Average Delay"] <= delay_range[1]) &
+        (stats_by_station["Total Services"] >= min_services) &
+        (stats_by_station["Category"].isin(categories_filter))
+    ].copy()
 
 st.markdown("---")
 kpi1, kpi2, kpi3, kpi4, kpi5 = st.columns(5)
@@ -175,79 +149,152 @@ with kpi5:
 
 st.markdown("---")
 
-# Create custom hover text
-filtered_data["hover_text"] = filtered_data.apply(
-    lambda row: (
-        f"<b style='font-size:14px'>{row['Station']}</b><br>"
-        f"<span style='color:#666'>━━━━━━━━━━━━━━━━</span><br>"
-        f"<b>⏱️ Average Delay:</b> {row['Average Delay']:.2f} min<br>"
-        f"<b>📊 Std Deviation:</b> {row['Delay Std Dev']:.2f} min<br>"
-        f"<b>🚆 Total Services:</b> {int(row['Total Services']):,}<br>"
-        f"<b>❌ Cancellations:</b> {int(row['Total Cancellations'])} "
-        f"({row['Cancellation Rate (%)']:.1f}%)<br>"
-        f"<b>⏰ Delayed Trains:</b> {int(row['Total Delayed Trains'])}<br>"
-        f"<b>✅ Punctuality:</b> {row['Punctuality Rate (%)']:.1f}%<br>"
-        f"<b>🏷️ Category:</b> {row['Category']}"
-    ),
-    axis=1
-)
+def build_station_map():
+    # Hover text is formatted client-side from customdata
+    with timing.timed("map hover text"):
+        hover_data, hover_format = hover_template(
+            filtered_data,
+            "<b style='font-size:14px'>{Station}</b><br>"
+            "<span style='color:#666'>━━━━━━━━━━━━━━━━</span>",
+            [
+                ("⏱️ Average Delay", "{Average Delay:.2f} min"),
+                ("📊 Std Deviation", "{Delay Std Dev:.2f} min"),
+                ("🚆 Total Services", "{Total Services:,d}"),
+                ("❌ Cancellations", "{Total Cancellations:d} ({Cancellation Rate (%):.1f}%)"),
+                ("⏰ Delayed Trains", "{Total Delayed Trains:d}"),
+                ("✅ Punctuality", "{Punctuality Rate (%):.1f}%"),
+                ("🏷️ Category", "{Category}")
+            ]
+        )
 
-max_size = 50
-min_size = 10
-size_values = filtered_data[size_metric]
-if size_values.max() > 0:
-    normalized_sizes = (
-        (size_values - size_values.min()) / (size_values.max() - size_values.min()) 
-        * (max_size - min_size) + min_size
-    )
-else:
-    normalized_sizes = [min_size] * len(filtered_data)
-
-fig = go.Figure()
-
-fig.add_trace(go.Scattermapbox(
-    lat=filtered_data["lat"],
-    lon=filtered_data["lon"],
-    mode="markers",
-    marker=dict(
-        size=normalized_sizes,
-        color=filtered_data["Average Delay"],
-        colorscale="Turbo",
-        showscale=True,
-        colorbar=dict(
-            title=dict(
-                text="Average<br>Delay<br>(min)",
-                side="right"
+    max_size = 50
+    min_size = 10
+    size_values = filtered_data[size_metric]
+    if size_values.max() > 0:
+        normalized_sizes = (
+            (size_values - size_values.min()) / (size_values.max() - size_values.min()) 
+            * (max_size - min_size) + min_size
+        )
+    else:
+        normalized_sizes = [min_size] * len(filtered_data)
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Scattermapbox(
+        lat=filtered_data["lat"],
+        lon=filtered_data["lon"],
+        mode="markers",
+        marker=dict(
+            size=normalized_sizes,
+            color=filtered_data["Average Delay"],
+            colorscale="Turbo",
+            showscale=True,
+            colorbar=dict(
+                title=dict(
+                    text="Average<br>Delay<br>(min)",
+                    side="right"
+                ),
+                thickness=15,
+                len=0.6,
+                x=1.01,
+                xpad=10
             ),
-            thickness=15,
-            len=0.6,
-            x=1.01,
-            xpad=10
+            opacity=0.85
+        ),
+        customdata=hover_data,
+        hovertemplate=hover_format,
+        name=""
+    ))
+
+    # Map configuration
+    fig.update_layout(
+        mapbox=dict(
+            style="carto-darkmatter",
+            zoom=5,
+            center=dict(lat=46.8, lon=2.5)
         ),
-        opacity=0.85
-    ),
-    text=filtered_data["hover_text"],
-    hovertemplate="%{text}<extra></extra>",
-    name="",
-    customdata=filtered_data["Station"]
-))
-
-# Map configuration
-fig.update_layout(
-    mapbox=dict(
-        style="carto-darkmatter",
-        zoom=5,
-        center=dict(lat=46.8, lon=2.5)
-    ),
-    height=650,
-    margin=dict(l=0, r=0, t=0, b=0),
-    hovermode="closest",
-    showlegend=False,
-    paper_bgcolor="#0e1117",
-    plot_bgcolor="#0e1117"
+        height=650,
+        margin=dict(l=0, r=0, t=0, b=0),
+        hovermode="closest",
+        showlegend=False,
+        paper_bgcolor="#0e1117",
+        plot_bgcolor="#0e1117"
+    )
+    return fig
+
+fig = cached_figure(
+    "station map",
+    build_station_map,
+    size_metric=size_metric,
+    delay_range=delay_range,
+    min_services=min_services,
+    categories=set(categories_filter)
 )
 
-st.plotly_chart(fig, use_container_width=True)
+plotly_chart(fig, use_container_width=True)
+
+st.markdown("---")
+st.subheader("🛤️ Route Flows")
+st.caption("Each line is an origin → destination route, colored by its average arrival delay.")
+
+routes = get_routes().dropna(subset=["dep_lat", "dep_lon", "arr_lat", "arr_lon"])
+route_colors = {"Excellent": "#2ecc71", "Good": "#f1c40f", "Average": "#e67e22", "Poor": "#e74c3c"}
+
+def build_flow_map():
+    flow_fig = go.Figure()
+
+    # One line trace per delay category, routes separated by NaN gaps
+    for category, (lat, lon) in get_route_segments().items():
+        flow_fig.add_trace(go.Scattermapbox(
+            lat=lat,
+            lon=lon,
+            mode="lines",
+            line=dict(width=2, color=route_colors[category]),
+            opacity=0.7,
+            hoverinfo="skip",
+            name=category
+        ))
+
+    # Lines only hover at their ends: route details are shown on midpoint markers
+    with timing.timed("route hover text"):
+        route_hover, route_format = hover_template(
+            routes.assign(Route=routes["Gare de départ"].astype(str) + " → " + routes["Gare d'arrivée"].astype(str)),
+            "<b>{Route}</b>",
+            [
+                ("⏱️ Average Delay", "{Average Delay:.2f} min"),
+                ("🚆 Total Services", "{Total Services:,d}"),
+                ("❌ Cancellations", "{Total Cancellations:d}"),
+                ("🏷️ Category", "{Delay Category}")
+            ]
+        )
+
+    flow_fig.add_trace(go.Scattermapbox(
+        lat=(routes["dep_lat"] + routes["arr_lat"]) / 2,
+        lon=(routes["dep_lon"] + routes["arr_lon"]) / 2,
+        mode="markers",
+        marker=dict(size=6, color=routes["Delay Category"].map(route_colors).astype(str)),
+        customdata=route_hover,
+        hovertemplate=route_format,
+        name="",
+        showlegend=False
+    ))
+
+    flow_fig.update_layout(
+        mapbox=dict(
+            style="carto-darkmatter",
+            zoom=4.5,
+            center=dict(lat=46.8, lon=2.5)
+        ),
+        height=650,
+        margin=dict(l=0, r=0, t=0, b=0),
+        legend=dict(title="Average Delay", bgcolor="rgba(14,17,23,0.7)", font=dict(color="white")),
+        paper_bgcolor="#0e1117"
+    )
+    return flow_fig
+
+flow_fig = cached_figure("route flows", build_flow_map)
+
+plotly_chart(flow_fig, use_container_width=True)
 
 st.markdown("---")
 st.subheader("📊 Station Rankings")
@@ -376,3 +423,5 @@ with insight_col3:
     Average: {avg_cancel:.2f}%  
     Max: {filtered_data['Cancellation Rate (%)'].max():.2f}%
     """)
+
+timing_panel()
@@ -0,0 +1,76 @@
+import os
+import pickle
+
+import pandas as pd
+import pytest
+
+from util.cache import ReadOnlyFrame, SharedFrameError, cached_pickle, freeze
+
+
+def shared_frame():
+    return freeze(pd.DataFrame({
+        "Retard": [1.0, 2.0],
+        "Trains": [10, 20],
+        "Season": pd.Categorical(["Winter", "Summer"]),
+        "Gare": ["PARIS LYON", "LYON PART DIEU"],
+    }))
+
+
+@pytest.mark.parametrize("write", [
+    lambda df: df.__setitem__("Retard", 0.0),
+    lambda df: df.loc.__setitem__((slice(None), "Retard"), 0.0),
+    lambda df: df.iloc.__setitem__((slice(None), 0), 0.0),
+    lambda df: df.loc.__setitem__((slice(None), "Season"), "Summer"),
+    lambda df: df.loc.__setitem__((0, "Gare"), "NICE"),
+    lambda df: df.at.__setitem__((0, "Gare"), "NICE"),
+    lambda df: df.iat.__setitem__((0, 1), 0),
+    lambda df: df.isetitem(0, [0.0, 0.0]),
+    lambda df: df.update(pd.DataFrame({"Retard": [9.0, 9.0]})),
+    lambda df: df.insert(0, "New", 1),
+    lambda df: df.pop("Retard"),
+    lambda df: df.rename(columns=str.upper, inplace=True),
+])
+def test_writes_are_refused(write):
+    df = shared_frame()
+    before = pd.DataFrame(df).copy()
+    with pytest.raises(SharedFrameError):
+        write(df)
+    pd.testing.assert_frame_equal(pd.DataFrame(df), before)
+
+
+def test_column_views_are_read_only():
+    with pytest.raises(ValueError):
+        shared_frame()["Retard"].to_numpy()[0] = 0.0
+
+
+def test_reads_and_derived_frames():
+    df = shared_frame()
+    assert df.loc[0, "Retard"] == 1.0
+    assert df.iloc[1, 1] == 20
+    assert df.at[1, "Gare"] == "LYON PART DIEU"
+    derived = df.assign(Total=df["Trains"] * 2)
+    derived.loc[:, "Retard"] = 0.0
+    assert not isinstance(derived, ReadOnlyFrame)
+
+
+def test_pickles_as_a_plain_frame():
+    df = shared_frame()
+    restored = pickle.loads(pickle.dumps(df))
+    assert type(restored) is pd.DataFrame
+    pd.testing.assert_frame_equal(restored, pd.DataFrame(df))
+
+
+def test_older_versions_are_deleted(tmp_path):
+    source = tmp_path / "data.csv"
+    cache_dir = str(tmp_path / "cache")
+    source.write_text("2024-01\n")
+    cached_pickle("months", str(source), build=lambda: ["2024-01"], cache_dir=cache_dir)
+    source.write_text("2024-01\n2024-02\n")
+    months = cached_pickle(
+        "months", str(source),
+        build=lambda: pytest.fail("should be updated"),
+        update=lambda previous: previous + ["2024-02"],
+        cache_dir=cache_dir,
+    )
+    assert months == ["2024-01", "2024-02"]
+    assert len([name for name in os.listdir(cache_dir) if name.startswith("months-")]) == 1
@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+from bench.synthetic import generate_csv
+from util import config
+from util.ingest import load_dataset, load_quality, load_rollups
+
+MONTHS = 12
+# Counters the quality report derives from the pipeline, the dataset and the sketch
+QUALITY_KEYS = [
+    "rows", "lines_kept", "lines_rejected", "records_recovered", "rejected_by_reason",
+    "rows_loaded", "rows_rejected", "negative_rejects", "null_rejects", "nulls", "outliers", "stats",
+]
+
+
+@pytest.fixture
+def extract(tmp_path):
+    """Full synthetic extract, with malformed lines between months, and its first months only."""
+    full = tmp_path / "full.csv"
+    generate_csv(
+        full, rows=2_400, months=MONTHS, chunk_rows=200, seed=7,
+        negative_rate=0.01, null_rate=0.01, malformed_rate=0.01,
+    )
+    text = full.read_text(encoding="utf-8")
+    cut = text.index("\n2018-09;") + 1
+    return text[:cut], text
+
+
+def ingest(monkeypatch, cache_dir, path):
+    monkeypatch.setenv("SNCF_CACHE_DIR", str(cache_dir))
+    monkeypatch.delenv("SNCF_QUARANTINE_PATH", raising=False)
+    df = load_dataset(str(path))
+    return df, load_rollups(df, str(path)), load_quality(df, str(path))
+
+
+def assert_same_report(actual, expected):
+    for key in QUALITY_KEYS:
+        a, e = actual[key], expected[key]
+        if isinstance(e, pd.Series):
+            pd.testing.assert_series_equal(a.sort_index(), e.sort_index(), check_names=False)
+        elif isinstance(e, dict) and key == "outliers":
+            assert a == pytest.approx(e), key
+        else:
+            assert a == e, key
+
+
+def test_append_equals_full_rebuild(monkeypatch, tmp_path, extract):
+    first_months, full = extract
+    path = tmp_path / "data.csv"
+
+    path.write_text(first_months, encoding="utf-8")
+    previous, _, _ = ingest(monkeypatch, tmp_path / "incremental", path)
+    assert previous["Date"].dt.month.max() == 8
+    path.write_text(full, encoding="utf-8")
+    df, cube, quality = ingest(monkeypatch, tmp_path / "incremental", path)
+    incremental_quarantine = config.quarantine_path()
+
+    expected_df, expected_cube, expected_quality = ingest(monkeypatch, tmp_path / "rebuild", path)
+
+    assert df["Date"].dt.month.nunique() == MONTHS
+    pd.testing.assert_frame_equal(pd.DataFrame(df), pd.DataFrame(expected_df))
+    assert cube.keys() == expected_cube.keys()
+    for grain in cube:
+        pd.testing.assert_frame_equal(cube[grain], expected_cube[grain], check_exact=False, rtol=1e-9)
+    assert quality["lines_rejected"] > 0
+    assert_same_report(quality, expected_quality)
+    with open(incremental_quarantine, encoding="utf-8") as f, open(config.quarantine_path(), encoding="utf-8") as g:
+        assert f.read() == g.read()
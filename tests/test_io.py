@@ -0,0 +1,65 @@
+import csv
+from io import StringIO
+
+import pandas as pd
+
+from util.io import REJECT_FIELD_COUNT, REJECT_NO_DATE, REJECT_OPEN_QUOTE, LineFilter
+
+HEADER = "Date;Service;Commentaire;Retard\n"
+
+
+def record(month, comment="", delay=1.5):
+    return f"2024-{month:02d};National;{comment};{delay}\n"
+
+
+def read(text):
+    quarantine = StringIO()
+    lines = LineFilter(StringIO(HEADER + text), quarantine=quarantine)
+    df = pd.read_csv(lines, sep=";")
+    return df, lines, list(csv.reader(StringIO(quarantine.getvalue())))
+
+
+def test_stray_quote_in_unquoted_field_is_literal():
+    text = record(1, 'Retard de 5" sur la ligne') + "".join(record(m % 12 + 1) for m in range(49))
+    df, lines, rejected = read(text)
+    assert len(df) == 50
+    assert len(df) == len(pd.read_csv(StringIO(HEADER + text), sep=";"))
+    assert df["Commentaire"][0] == 'Retard de 5" sur la ligne'
+    assert lines.rejected == 0 and rejected == []
+
+
+def test_quoted_field_spanning_lines_is_recovered():
+    text = record(1) + record(2, '"Travaux\nsur la ligne ""Sud"""') + record(3)
+    df, lines, rejected = read(text)
+    assert len(df) == 3
+    assert df["Commentaire"][1] == 'Travaux\nsur la ligne "Sud"'
+    assert lines.recovered == 1 and lines.rejected == 0
+
+
+def test_unterminated_quote_only_rejects_its_line():
+    text = record(1) + record(2, '"Travaux sans fin') + "".join(record(3) for _ in range(150))
+    df, lines, rejected = read(text)
+    assert len(df) == 151
+    assert lines.reasons == {REJECT_OPEN_QUOTE: 1}
+    assert rejected == [["3", REJECT_OPEN_QUOTE, '2024-02;National;"Travaux sans fin;1.5']]
+
+
+def test_unterminated_quote_at_end_of_file():
+    text = record(1) + record(2, '"Travaux sans fin') + record(3) + record(4)
+    df, lines, rejected = read(text)
+    assert df["Date"].tolist() == ["2024-01", "2024-03", "2024-04"]
+    assert lines.reasons == {REJECT_OPEN_QUOTE: 1}
+
+
+def test_skipped_months_are_not_rejected_again():
+    text = (
+        record(1) + "Accident de personne\n" + record(1, '"Travaux sans fin') + record(1, "a;b")
+        + record(2) + "Panne de signalisation\n"
+    )
+    _, first, _ = read(text)
+    assert first.reasons == {REJECT_NO_DATE: 2, REJECT_FIELD_COUNT: 1, REJECT_OPEN_QUOTE: 1}
+
+    lines = LineFilter(StringIO(HEADER + text), skip_months={"2024-01"})
+    df = pd.read_csv(lines, sep=";")
+    assert df["Date"].tolist() == ["2024-02"]
+    assert lines.reasons == {REJECT_NO_DATE: 1}
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from util import routes
+from util.routes import RouteIndex
+from util.stations import ARRIVAL, DEPARTURE
+
+STATIONS = ["LYON PART DIEU", "MARSEILLE ST CHARLES", "NICE VILLE", "PARIS LYON", "PARIS MONTPARNASSE"]
+
+
+def fact_table(rows=500, seed=0):
+    rng = np.random.default_rng(seed)
+    departure = rng.choice(STATIONS[:4], rows).astype(object)
+    arrival = rng.choice(STATIONS, rows).astype(object)
+    # Rows without a station (code -1, slot 0 in the index)
+    departure[rng.random(rows) < 0.05] = None
+    arrival[rng.random(rows) < 0.05] = None
+    dtype = pd.CategoricalDtype(STATIONS)
+    return pd.DataFrame({
+        DEPARTURE: pd.Categorical(departure, dtype=dtype),
+        ARRIVAL: pd.Categorical(arrival, dtype=dtype),
+        "Retard": rng.normal(5, 2, rows),
+    })
+
+
+@pytest.fixture(params=["dense", "sparse"])
+def dense_keys(request, monkeypatch):
+    # "sparse" forces the np.unique path used for very large station tables
+    if request.param == "sparse":
+        monkeypatch.setattr(routes, "MAX_DENSE_KEYS", 0)
+
+
+def scan(mask):
+    return np.flatnonzero(mask.to_numpy())
+
+
+def test_departures_match_a_scan(dense_keys):
+    df = fact_table()
+    index = RouteIndex(df)
+    for station in STATIONS:
+        # Rows come grouped by route, in table order within each route
+        np.testing.assert_array_equal(np.sort(index.departures(station)), scan(df[DEPARTURE] == station))
+
+
+def test_arrivals_match_a_scan(dense_keys):
+    df = fact_table()
+    index = RouteIndex(df)
+    for station in STATIONS:
+        np.testing.assert_array_equal(np.sort(index.arrivals(station)), scan(df[ARRIVAL] == station))
+
+
+def test_routes_match_a_scan(dense_keys):
+    df = fact_table()
+    index = RouteIndex(df)
+    for departure in STATIONS:
+        for arrival in STATIONS:
+            expected = scan((df[DEPARTURE] == departure) & (df[ARRIVAL] == arrival))
+            np.testing.assert_array_equal(index.route(departure, arrival), expected)
+
+
+def test_unknown_stations_are_empty():
+    index = RouteIndex(fact_table())
+    assert len(index.departures("BORDEAUX ST JEAN")) == 0
+    assert len(index.arrivals("BORDEAUX ST JEAN")) == 0
+    assert len(index.route("PARIS LYON", "BORDEAUX ST JEAN")) == 0
+    assert len(index.route("BORDEAUX ST JEAN", "PARIS LYON")) == 0
+    # Known stations without rows between them
+    assert len(index.route("PARIS MONTPARNASSE", "NICE VILLE")) == 0
+
+
+def test_route_table_excludes_rows_without_a_station():
+    df = fact_table()
+    index = RouteIndex(df)
+    expected = df.groupby([DEPARTURE, ARRIVAL], observed=True).size()
+    actual = index.routes.set_index([DEPARTURE, ARRIVAL])["rows"]
+    pd.testing.assert_series_equal(actual, expected, check_names=False, check_dtype=False)
+    # Every row is in exactly one route slice, including those without a station
+    assert sorted(index.order) == list(range(len(df)))
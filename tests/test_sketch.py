@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from util.sketch import DEFAULT_ACCURACY, QuantileSketch, merge_moments
+
+
+def sketch_of(values):
+    return QuantileSketch().update(values)
+
+
+def test_merge_moments_matches_numpy_var():
+    rng = np.random.default_rng(0)
+    # Large offset: a sum of squares would lose most digits here
+    values = 1e6 + rng.normal(0, 3, 1000)
+    groups = rng.integers(0, 4, len(values))
+    parts = rng.integers(0, 10, len(values))
+    frame = pd.DataFrame({"group": groups, "part": parts, "x": values})
+
+    states = frame.groupby(["group", "part"])["x"]
+    count, total = states.count().to_frame(), states.sum().to_frame()
+    m2 = (states.var(ddof=0) * states.count()).to_frame()
+    count, total, m2 = merge_moments(count, total, m2, count.index.get_level_values("group"))
+
+    for group, x in frame.groupby("group")["x"]:
+        assert count.loc[group, "x"] == len(x)
+        assert total.loc[group, "x"] == pytest.approx(x.sum())
+        assert m2.loc[group, "x"] / len(x) == pytest.approx(np.var(x.to_numpy()), rel=1e-9)
+
+
+def test_merge_moments_ignores_empty_parts():
+    count = pd.DataFrame({"x": [0, 2, 3]})
+    total = pd.DataFrame({"x": [0.0, 4.0, 9.0]})
+    m2 = pd.DataFrame({"x": [0.0, 2.0, 0.0]})
+    count, total, m2 = merge_moments(count, total, m2, np.zeros(3, dtype=int))
+    assert m2["x"][0] == pytest.approx(np.var([1.0, 3.0, 3.0, 3.0, 3.0]) * 5)
+
+
+@pytest.mark.parametrize("values", [
+    np.random.default_rng(1).exponential(5, 10_000),
+    np.random.default_rng(2).normal(0, 10, 10_000),
+    np.concatenate([np.zeros(500), np.random.default_rng(3).uniform(0.01, 300, 5_000)]),
+])
+def test_quantiles_within_relative_accuracy(values):
+    qs = [0, 0.01, 0.25, 0.5, 0.75, 0.99, 1]
+    estimates = sketch_of(values).quantiles(qs)
+    exact = np.quantile(values, qs, method="lower")
+    np.testing.assert_array_less(np.abs(np.array(estimates) - exact), DEFAULT_ACCURACY * np.abs(exact) + 1e-12)
+
+
+def test_quantiles_ignore_nan_and_empty_sketch():
+    assert sketch_of([np.nan, 2.0, np.nan]).quantiles([0.5]) == pytest.approx([2.0], rel=DEFAULT_ACCURACY)
+    assert np.isnan(QuantileSketch().quantiles([0.5])[0])
+
+
+def test_merge_equals_sketch_of_concatenation():
+    rng = np.random.default_rng(4)
+    a, b = rng.normal(3, 5, 3_000), rng.exponential(8, 2_000)
+    merged = sketch_of(a).merge(sketch_of(b))
+    whole = sketch_of(np.concatenate([a, b]))
+    assert (merged.positive, merged.negative, merged.zeros) == (whole.positive, whole.negative, whole.zeros)
+    qs = [0.1, 0.5, 0.9]
+    assert merged.quantiles(qs) == whole.quantiles(qs)
+
+
+def test_merge_rejects_other_accuracy():
+    with pytest.raises(ValueError):
+        QuantileSketch(0.01).merge(QuantileSketch(0.02))
+
+
+def test_copy_is_independent():
+    sketch = sketch_of([1.0, 2.0])
+    copy = sketch.copy().merge(sketch_of([3.0]))
+    assert sum(sketch.positive.values()) == 2
+    assert sum(copy.positive.values()) == 3
+
+
+def test_count_outside():
+    values = np.arange(1, 101, dtype="float64")
+    sketch = sketch_of(np.concatenate([values, -values, [0.0]]))
+    # Bounds further than the accuracy from any value are exact
+    # Below 10.5: the negatives, zero and 1..10; above 90.5: 91..100
+    assert sketch.count_outside(10.5, 90.5) == 100 + 1 + 10 + 10
+    assert sketch.count_outside(-50.5, 50.5) == 50 + 50
+    assert sketch.count_outside(-1000, 1000) == 0
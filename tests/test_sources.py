@@ -0,0 +1,46 @@
+import csv
+from io import StringIO
+
+import pandas as pd
+
+from bench.synthetic import generate_csv
+from util import ingest
+from util.ingest import build_dataset, build_sources
+from util.stations import ARRIVAL, DEPARTURE
+
+
+def read_quarantine(f):
+    return list(csv.reader(StringIO(f.getvalue())))
+
+
+def test_split_files_equal_the_single_file(monkeypatch, tmp_path):
+    single = tmp_path / "data.csv"
+    generate_csv(single, rows=1_200, months=6, chunk_rows=100, seed=3, malformed_rate=0.02)
+    text = single.read_text(encoding="utf-8")
+    header, body = text.split("\n", 1)
+    cut = body.index("\n2018-04;") + 1
+    first, second = tmp_path / "data-a.csv", tmp_path / "data-b.csv"
+    first.write_text(header + "\n" + body[:cut], encoding="utf-8")
+    second.write_text(header + "\n" + body[cut:], encoding="utf-8")
+
+    stats, quarantine = {}, StringIO()
+    expected = build_dataset(str(single), stats=stats, quarantine=quarantine)
+    # Force the worker pool despite the small files
+    monkeypatch.setattr(ingest, "PARALLEL_MIN_BYTES", 0)
+    split_stats, split_quarantine = {}, StringIO()
+    df = build_sources([str(first), str(second)], split_stats, split_quarantine, workers=2)
+
+    pd.testing.assert_frame_equal(df, expected)
+    assert df[DEPARTURE].dtype == df[ARRIVAL].dtype == expected[DEPARTURE].dtype
+    assert split_stats == stats
+
+    rejected, split_rejected = read_quarantine(quarantine), read_quarantine(split_quarantine)
+    assert len(rejected) > 0
+    assert [row[1:] for row in split_rejected] == [row[1:] for row in rejected]
+    first_lines = first.read_text(encoding="utf-8").count("\n")
+    for (line, _, _), (split_line, _, _) in zip(rejected, split_rejected):
+        name, number = split_line.split(":")
+        if int(line) <= first_lines:
+            assert (name, int(number)) == ("data-a.csv", int(line))
+        else:
+            assert (name, int(number)) == ("data-b.csv", int(line) - first_lines + 1)
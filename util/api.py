@@ -0,0 +1,167 @@
+"""Local HTTP/JSON access to the dashboard figures, for reports and services.
+
+Serves the queries of util.queries over the cached dataset, loaded once at
+startup. Responses are cached in memory by path, query string and dataset
+version, and carry an ETag of their body so clients can revalidate cheaply:
+
+    python -m util.api [--host 127.0.0.1] [--port 8502]
+
+    GET /health
+    GET /stations
+    GET /stations/<name>/series?width=1200    (chart width in pixels, or ?points=n)
+    GET /monthly
+    GET /monthly/profile
+    GET /routes/top?n=10
+    GET /seasonal/routes
+    GET /seasonal/causes
+    GET /heatmap
+    GET /summer-impact?passengers_per_train=300&compensation_threshold=30
+"""
+import argparse
+import functools
+import hashlib
+import json
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+import pandas as pd
+
+from util import config, queries
+from util.cache import sources_key
+from util.ingest import DATASET_NAME
+from util.timeseries import WIDE_CHART_WIDTH, chart_points, downsample
+
+CACHE_ENTRIES = 512
+MAX_AGE = 300
+
+
+class NotFound(Exception):
+    pass
+
+
+def dataset_version():
+    return f"{DATASET_NAME}-{sources_key(config.data_paths())[:16]}"
+
+
+def to_json(result):
+    if isinstance(result, pd.DataFrame):
+        return result.to_json(orient="records", date_format="iso", force_ascii=False)
+    return json.dumps(result, ensure_ascii=False)
+
+
+def stations(params):
+    return queries.station_stats()
+
+
+def station_series(params, name):
+    if len(queries.shared_route_index().departures(name)) == 0:
+        raise NotFound(f"unknown station {name!r}")
+    series = queries.station_series(name)
+    points = params.get("points") or chart_points(int(params.get("width", WIDE_CHART_WIDTH)))
+    return downsample(series, "Date", queries.ARRIVAL_DELAY, int(points))
+
+
+def monthly(params):
+    return queries.monthly_series()
+
+
+def monthly_profile(params):
+    return queries.monthly_profile()
+
+
+def top_routes(params):
+    return queries.top_delayed_routes(int(params.get("n", 10)))
+
+
+def seasonal_routes(params):
+    return queries.route_seasonal_impact()
+
+
+def seasonal_causes(params):
+    return queries.seasonal_causes().rename_axis("Cause").reset_index()
+
+
+def heatmap(params):
+    pivot = queries.delay_heatmap()
+    pivot.columns = [str(year) for year in pivot.columns]
+    return pivot.reset_index()
+
+
+def summer_impact(params):
+    return queries.summer_impact(
+        passengers_per_train=float(params.get("passengers_per_train", 300)),
+        compensation_threshold=float(params.get("compensation_threshold", 30)),
+    )
+
+
+ROUTES = [
+    (r"/health", lambda params: {"status": "ok", "dataset": dataset_version()}),
+    (r"/stations", stations),
+    (r"/stations/(?P<name>[^/]+)/series", station_series),
+    (r"/monthly", monthly),
+    (r"/monthly/profile", monthly_profile),
+    (r"/routes/top", top_routes),
+    (r"/seasonal/routes", seasonal_routes),
+    (r"/seasonal/causes", seasonal_causes),
+    (r"/heatmap", heatmap),
+    (r"/summer-impact", summer_impact),
+]
+
+
+@functools.lru_cache(maxsize=CACHE_ENTRIES)
+def respond(path, query, version):
+    """(status, body, etag) of the request for `path` with sorted `query` pairs, against dataset `version`."""
+    params = dict(query)
+    for pattern, handler in ROUTES:
+        match = re.fullmatch(pattern, path)
+        if match:
+            break
+    else:
+        return 404, json.dumps({"error": f"unknown path {path!r}"}).encode(), None
+    try:
+        body = to_json(handler(params, **{k: unquote(v) for k, v in match.groupdict().items()})).encode()
+    except NotFound as error:
+        return 404, json.dumps({"error": str(error)}).encode(), None
+    except ValueError as error:
+        return 400, json.dumps({"error": str(error)}).encode(), None
+    return 200, body, '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+
+
+class Handler(BaseHTTPRequestHandler):
+    dataset = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        status, body, etag = respond(url.path.rstrip("/") or "/", tuple(sorted(parse_qsl(url.query))), self.dataset)
+        if etag is not None and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if etag is not None:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", f"max-age={MAX_AGE}")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(host="127.0.0.1", port=8502):
+    queries.shared_rollups()
+    queries.shared_stations()
+    queries.shared_route_index()
+    Handler.dataset = dataset_version()
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"Serving {Handler.dataset} on http://{host}:{port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the dashboard figures as JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args()
+    serve(args.host, args.port)
@@ -0,0 +1,302 @@
+import glob
+import hashlib
+import json
+import os
+import pickle
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from pandas.core import indexing
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent cold starts may build twice
+    fcntl = None
+
+from util import config
+
+MANIFEST = "manifest.json"
+BUILD_LOCK = "build.lock"
+
+
+def file_hash(path):
+    """SHA-256 of a file, read in 1 MB blocks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def source_key(path, cache_dir=None):
+    """Return the content hash identifying the current version of `path`.
+
+    The hash is only recomputed when the file size or mtime differ from the
+    ones recorded in the manifest, so a warm start costs a single stat().
+    Entries are keyed by file name, so a cache directory built elsewhere can
+    be shipped alongside the data; if the source file itself is absent, the
+    manifest entry is trusted.
+    """
+    cache_dir = cache_dir or config.cache_dir()
+    manifest = _read_manifest(cache_dir)
+    entry = manifest.get(os.path.basename(path))
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        if entry:
+            return entry["sha256"]
+        raise
+    if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+        return entry["sha256"]
+
+    digest = file_hash(path)
+    manifest[os.path.basename(path)] = {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha256": digest,
+    }
+    _write_manifest(cache_dir, manifest)
+    return digest
+
+
+def sources_key(paths, cache_dir=None):
+    """Content hash identifying the current version of a set of source files.
+
+    A single file (or path) keeps its own source_key, so single-file caches
+    are named as before.
+    """
+    paths = [paths] if isinstance(paths, str) else list(paths)
+    if len(paths) == 1:
+        return source_key(paths[0], cache_dir)
+    h = hashlib.sha256()
+    for path in sorted(paths, key=os.path.basename):
+        h.update(f"{os.path.basename(path)}:{source_key(path, cache_dir)}\n".encode())
+    return h.hexdigest()
+
+
+def cached_frame(name, path, build, update=None, cache_dir=None):
+    """Load the frame derived from `path`, building it only if the source changed.
+
+    `build` is called without arguments on a cache miss and must return a
+    DataFrame with a default index. The result is stored as an uncompressed
+    Arrow IPC file named after `name` and the source hash, and mapped back
+    zero-copy on later starts (see write_arrow/read_arrow), so server
+    processes sharing the cache directory share one copy in the page cache.
+    A read-only cache directory is used as is.
+
+    If `update` is given and an older version of the frame is cached, the
+    new one is computed as `update(previous)` instead of rebuilding it.
+    Older versions are deleted once the new one is written.
+    `path` may also be a list of source files, see sources_key.
+    """
+    return _cached(name, path, build, update, cache_dir, "arrow", read=read_arrow, write=write_arrow)
+
+
+def write_arrow(df, f):
+    """Write `df` as an uncompressed Arrow IPC file that read_arrow can map without copying.
+
+    The file holds a single record batch (columns split in chunks would be
+    concatenated, hence copied, on conversion back to pandas), and missing
+    floats are stored as NaN values rather than Arrow nulls, for the same
+    reason.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_floating(field.type) and table.column(i).null_count:
+            table = table.set_column(i, field, pa.array(df[field.name].to_numpy()))
+    feather.write_feather(table, f, compression="uncompressed", chunksize=max(len(table), 1))
+
+
+def read_arrow(f):
+    """Frame of the Arrow file `f`, memory-mapped.
+
+    Numeric and datetime columns without nulls are views on the mapping
+    (read-only, and shared with every process mapping the same file);
+    categoricals are rebuilt from their codes and strings are copied.
+    """
+    return feather.read_table(f, memory_map=True).to_pandas(split_blocks=True)
+
+
+def cached_pickle(name, path, build, update=None, cache_dir=None):
+    """Same as cached_frame for arbitrary picklable objects (e.g. rollup cubes)."""
+
+    def read(f):
+        with open(f, "rb") as fh:
+            return pickle.load(fh)
+
+    def write(obj, f):
+        with open(f, "wb") as fh:
+            pickle.dump(obj, fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+    return _cached(name, path, build, update, cache_dir, "pkl", read=read, write=write)
+
+
+def _cached(name, path, build, update, cache_dir, ext, read, write):
+    cache_dir = cache_dir or config.cache_dir()
+    target = os.path.join(cache_dir, f"{name}-{sources_key(path, cache_dir)[:16]}.{ext}")
+    if os.path.exists(target):
+        return read(target)
+
+    with _build_lock(cache_dir):
+        # Another process may have built it while we waited for the lock
+        if os.path.exists(target):
+            return read(target)
+
+        previous = _latest(cache_dir, name, ext) if update else None
+        obj = update(read(previous)) if previous else build()
+
+        tmp = f"{target}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            write(obj, tmp)
+            os.replace(tmp, target)
+        except OSError:
+            return obj
+        _remove_older(cache_dir, name, ext, keep=target)
+    # Read back, so that the building process maps the same file as the others
+    return read(target)
+
+
+@contextmanager
+def _build_lock(cache_dir):
+    """Exclusive lock on the cache directory, so processes starting together build each file once."""
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        f = open(os.path.join(cache_dir, BUILD_LOCK), "w")
+    except OSError:
+        yield
+        return
+    with f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def _remove_older(cache_dir, name, ext, keep):
+    """Delete the cache files for `name` other than `keep`, e.g. the dataset before the last monthly update.
+
+    Processes still mapping a deleted file keep their mapping (the space is
+    freed when they exit); where a file in use cannot be deleted, it is left
+    for the next build.
+    """
+    for path in glob.glob(os.path.join(glob.escape(cache_dir), f"{glob.escape(name)}-*.{ext}")):
+        if os.path.abspath(path) != os.path.abspath(keep):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _latest(cache_dir, name, ext):
+    """Most recently written cache file for `name`, if any."""
+    pattern = os.path.join(glob.escape(cache_dir), f"{glob.escape(name)}-*.{ext}")
+    files = glob.glob(pattern)
+    return max(files, key=os.path.getmtime) if files else None
+
+
+class SharedFrameError(RuntimeError):
+    """Raised when code tries to modify a frame shared between sessions."""
+
+
+class ReadOnlyFrame(pd.DataFrame):
+    """DataFrame shared by every session of the app, which must not be modified.
+
+    Column assignment, writes through `.loc`/`.iloc`/`.at`/`.iat` and in-place
+    methods raise SharedFrameError, and the underlying numeric/datetime
+    arrays are flagged read-only so that writes through views of its
+    columns fail too (object arrays are left alone because several pandas
+    kernels reject read-only object buffers).
+    Anything derived from it (filters, groupbys, `.copy()`, `.assign()`) is a
+    regular, writable DataFrame, and it is pickled as one.
+    """
+
+    @property
+    def _constructor(self):
+        return pd.DataFrame
+
+    def _refuse(self, *args, **kwargs):
+        raise SharedFrameError(
+            "The shared dataset is read-only; work on df.copy() or df.assign(...) instead."
+        )
+
+    __setitem__ = _refuse
+    __delitem__ = _refuse
+    __setattr__ = _refuse
+    insert = _refuse
+    pop = _refuse
+    isetitem = _refuse
+    update = _refuse
+    _set_item = _refuse
+    _set_item_mgr = _refuse
+    _iset_item_mgr = _refuse
+    _update_inplace = _refuse
+
+    @property
+    def loc(self):
+        return _ReadOnlyLoc("loc", self)
+
+    @property
+    def iloc(self):
+        return _ReadOnlyILoc("iloc", self)
+
+    @property
+    def at(self):
+        return _ReadOnlyAt("at", self)
+
+    @property
+    def iat(self):
+        return _ReadOnlyIAt("iat", self)
+
+    def __reduce__(self):
+        return pd.DataFrame(self).__reduce__()
+
+
+class _ReadOnlyLoc(indexing._LocIndexer):
+    __setitem__ = ReadOnlyFrame._refuse
+
+
+class _ReadOnlyILoc(indexing._iLocIndexer):
+    __setitem__ = ReadOnlyFrame._refuse
+
+
+class _ReadOnlyAt(indexing._AtIndexer):
+    __setitem__ = ReadOnlyFrame._refuse
+
+
+class _ReadOnlyIAt(indexing._iAtIndexer):
+    __setitem__ = ReadOnlyFrame._refuse
+
+
+def freeze(df):
+    """Wrap `df` (without copying) in a ReadOnlyFrame with read-only arrays."""
+    for block in df._mgr.blocks:
+        values = block.values
+        if isinstance(values, pd.Categorical):
+            values = values._codes
+        values = getattr(values, "_ndarray", values)
+        if isinstance(values, np.ndarray) and values.dtype != object:
+            values.flags.writeable = False
+    return ReadOnlyFrame(df)
+
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(cache_dir, manifest):
+    path = os.path.join(cache_dir, MANIFEST)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, path)
+    except OSError:
+        pass
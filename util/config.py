@@ -0,0 +1,71 @@
+import glob
+import os
+import re
+
+# Data shipped with the repository, independent of the working directory.
+PACKAGE_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+# Environment variables overriding the defaults, e.g. to run several replicas
+# from a shared read-only volume:
+#   SNCF_DATA_DIR        directory holding data.csv and locations.csv
+#   SNCF_DATA_PATH       regularity CSV (default: every $SNCF_DATA_DIR/data*.csv, ingested together)
+#   SNCF_DATA_PATTERN    file name pattern of the regularity CSVs in $SNCF_DATA_DIR (default: data*.csv)
+#   SNCF_LOCATIONS_PATH  station coordinates (default: the latest $SNCF_DATA_DIR/locations-v<n>.csv
+#                        written by util.geocode, else $SNCF_DATA_DIR/locations.csv)
+#   SNCF_CACHE_DIR       Arrow/pickle cache, possibly pre-built (default: $SNCF_DATA_DIR/.cache)
+#   SNCF_QUARANTINE_PATH CSV of records rejected by load_data (default: $SNCF_CACHE_DIR/quarantine.csv)
+#   SNCF_TIMINGS_PATH    JSON lines file each page run's timings are appended to (default: not written)
+#   SNCF_DEBUG           show the timings panel in the sidebar (also enabled by ?debug=1)
+
+
+def data_dir():
+    return os.environ.get("SNCF_DATA_DIR") or PACKAGE_DATA_DIR
+
+
+def data_path():
+    return os.environ.get("SNCF_DATA_PATH") or os.path.join(data_dir(), "data.csv")
+
+
+def data_paths():
+    """Regularity CSVs to ingest: SNCF_DATA_PATH if set, else the matching files of the data directory.
+
+    The SNCF extract may be split per year, and other operators' files with
+    the same schema can sit next to it (data-2023.csv, data-ouigo.csv...).
+    """
+    if os.environ.get("SNCF_DATA_PATH"):
+        return [os.environ["SNCF_DATA_PATH"]]
+    pattern = os.environ.get("SNCF_DATA_PATTERN") or "data*.csv"
+    return sorted(glob.glob(os.path.join(glob.escape(data_dir()), pattern))) or [data_path()]
+
+
+def locations_path():
+    if os.environ.get("SNCF_LOCATIONS_PATH"):
+        return os.environ["SNCF_LOCATIONS_PATH"]
+    versions = locations_versions()
+    return versions[max(versions)] if versions else os.path.join(data_dir(), "locations.csv")
+
+
+def locations_versions():
+    """{version: path} of the coordinate tables written by util.geocode in the data directory."""
+    versions = {}
+    for path in glob.glob(os.path.join(data_dir(), "locations-v*.csv")):
+        match = re.fullmatch(r"locations-v(\d+)\.csv", os.path.basename(path))
+        if match:
+            versions[int(match.group(1))] = path
+    return versions
+
+
+def cache_dir():
+    return os.environ.get("SNCF_CACHE_DIR") or os.path.join(data_dir(), ".cache")
+
+
+def quarantine_path():
+    return os.environ.get("SNCF_QUARANTINE_PATH") or os.path.join(cache_dir(), "quarantine.csv")
+
+
+def timings_path():
+    return os.environ.get("SNCF_TIMINGS_PATH") or None
+
+
+def debug():
+    return os.environ.get("SNCF_DEBUG", "") not in ("", "0")
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+# Bump whenever add_features changes its output so on-disk caches are rebuilt.
+FEATURES_VERSION = 2
+
+SEASONS = {
+    12: 'Winter', 1: 'Winter', 2: 'Winter',
+    3: 'Spring', 4: 'Spring', 5: 'Spring',
+    6: 'Summer', 7: 'Summer', 8: 'Summer',
+    9: 'Fall', 10: 'Fall', 11: 'Fall'
+}
+
+DELAY_BINS = [-np.inf, 2, 5, 10, np.inf]
+DELAY_LABELS = ['Excellent', 'Good', 'Average', 'Poor']
+
+ROUTE_BINS = [-np.inf, 200, 500, np.inf]
+ROUTE_LABELS = ['Short Distance', 'Medium Distance', 'Long Distance']
+
+
+def add_features(df):
+    """Add the temporal, KPI and categorical features documented on the cleaning page."""
+    df = df.copy()
+
+    # Temporal features
+    df['Year'] = df['Date'].dt.year
+    df['Month'] = df['Date'].dt.month
+    df['Month_Name'] = df['Date'].dt.month_name().astype('category')
+    df['Quarter'] = df['Date'].dt.quarter
+    df['Season'] = df['Month'].map(SEASONS).astype('category')
+
+    # Derived metrics
+    services = df['Nombre de circulations prévues']
+    df['Punctuality_Rate'] = 100 - (df['Nombre de trains en retard à l\'arrivée'] / services * 100)
+    df['Cancellation_Rate'] = df['Nombre de trains annulés'] / services * 100
+    df['Delay_Impact'] = (df['Retard moyen de tous les trains à l\'arrivée'] *
+                          df['Nombre de trains en retard à l\'arrivée'])
+    df['Service_Reliability'] = (df['Punctuality_Rate'] * 0.6) + ((100 - df['Cancellation_Rate']) * 0.4)
+
+    # Categorical features
+    df['Delay_Category'] = pd.cut(
+        df['Retard moyen de tous les trains à l\'arrivée'],
+        bins=DELAY_BINS, labels=DELAY_LABELS, right=False
+    )
+    df['Route_Type'] = pd.cut(
+        df['Durée moyenne du trajet'],
+        bins=ROUTE_BINS, labels=ROUTE_LABELS, right=False
+    )
+
+    return df
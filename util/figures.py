@@ -0,0 +1,72 @@
+import json
+import threading
+from collections import OrderedDict
+
+MAX_BYTES = 64 * 2**20
+MAX_ENTRIES = 256
+
+
+def normalise_state(state):
+    """JSON-able form of widget `state` in which equivalent states compare equal.
+
+    Floats (slider values) are rounded, numpy scalars unwrapped, and sets
+    (e.g. multiselect choices, whose order does not matter) sorted.
+    """
+    if isinstance(state, dict):
+        return {str(k): normalise_state(v) for k, v in state.items()}
+    if isinstance(state, (set, frozenset)):
+        return sorted(normalise_state(v) for v in state)
+    if isinstance(state, (list, tuple)):
+        return [normalise_state(v) for v in state]
+    if hasattr(state, "item"):
+        state = state.item()
+    if isinstance(state, float):
+        return round(state, 6)
+    return state
+
+
+def figure_key(name, version, state):
+    """Cache key of figure `name` built from dataset `version` for widget `state`."""
+    return name, version, json.dumps(normalise_state(state), sort_keys=True, default=str)
+
+
+class FigureCache:
+    """Thread-safe LRU cache of built Plotly figures, capped in entries and serialized size.
+
+    Figures are kept as objects: rebuilding one from its JSON costs more than
+    building it from the aggregates, and st.plotly_chart copies the figure
+    before serializing it. Cached figures are shared and must not be modified.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES, max_entries=MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, build):
+        """Figure for `key`, calling `build()` on a miss. Returns (figure, hit)."""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0], True
+        fig = build()
+        size = len(fig.to_json())
+        with self.lock:
+            self.misses += 1
+            if size <= self.max_bytes and key not in self.entries:
+                self.entries[key] = (fig, size)
+                self.size += size
+                while self.size > self.max_bytes or len(self.entries) > self.max_entries:
+                    _, (_, evicted) = self.entries.popitem(last=False)
+                    self.size -= evicted
+        return fig, False
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
@@ -0,0 +1,117 @@
+"""Offline resolution of station coordinates.
+
+Every station name of the regularity extract(s), departure and arrival, is
+matched against a local gazetteer (any CSV of station names with latitude
+and longitude, e.g. an export of the SNCF station list). Names are
+normalised first (accents, case, punctuation, "ST"/"SAINT", "GARE DE"...),
+then matched exactly, then fuzzily. Coordinates already present in the
+current table are kept as they are.
+
+The result is written as the next version of the coordinate table,
+data/locations-v<n>.csv, which util.config picks up from then on; the app
+itself never geocodes. Run it when new stations appear in the data:
+
+    python -m util.geocode gazetteer.csv [--data data.csv ...]
+"""
+import argparse
+import os
+import re
+import unicodedata
+from difflib import SequenceMatcher, get_close_matches
+
+import numpy as np
+import pandas as pd
+
+from util import config
+from util.io import get_locations, load_data
+from util.stations import ARRIVAL, DEPARTURE
+
+STOP_WORDS = {"GARE", "DE", "D", "DU", "DES"}
+ABBREVIATIONS = {"ST": "SAINT", "STE": "SAINTE"}
+FUZZY_CUTOFF = 0.85
+
+
+def normalise(name):
+    """Matching key of a station name: "Saint-Pierre-des-Corps" and "ST PIERRE DES CORPS" give the same key."""
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode().upper()
+    tokens = re.sub(r"[^A-Z0-9]+", " ", text).split()
+    return " ".join(ABBREVIATIONS.get(token, token) for token in tokens if token not in STOP_WORDS)
+
+
+def station_names(paths):
+    """Sorted station names found in either station column of the CSVs at `paths`."""
+    names = set()
+    for path in paths:
+        df = load_data(path)
+        names.update(df[DEPARTURE].dropna())
+        names.update(df[ARRIVAL].dropna())
+    return sorted(names)
+
+
+def read_gazetteer(path, name="Gare", lat="lat", lon="lon"):
+    """Gazetteer as columns name, lat, lon and key (normalised name), one row per key."""
+    gazetteer = pd.read_csv(path, sep=None, engine="python", encoding="utf-8-sig")
+    gazetteer = gazetteer.rename(columns={name: "name", lat: "lat", lon: "lon"})[["name", "lat", "lon"]]
+    gazetteer = gazetteer.dropna().assign(key=lambda g: g["name"].map(normalise))
+    return gazetteer.drop_duplicates("key").set_index("key")
+
+
+def resolve(names, gazetteer, known=None, cutoff=FUZZY_CUTOFF):
+    """Coordinate table with one row per station of `names`.
+
+    Columns are Gare, lat, lon and how the coordinates were found: `match`
+    ("known" when taken from the `known` table, "exact", "fuzzy" or
+    "unmatched"), the gazetteer `source` name and the similarity `score` of
+    the normalised names. Fuzzy matches below `cutoff` are left unmatched.
+    """
+    known = pd.DataFrame(columns=["Gare", "lat", "lon"]) if known is None else known
+    known = known.dropna(subset=["lat", "lon"]).drop_duplicates("Gare").set_index("Gare")
+    keys = list(gazetteer.index)
+
+    rows = []
+    for name in names:
+        if name in known.index:
+            rows.append({"Gare": name, **known.loc[name, ["lat", "lon"]], "match": "known", "source": name, "score": 1.0})
+            continue
+        key = normalise(name)
+        match = "exact"
+        if key not in gazetteer.index:
+            close = get_close_matches(key, keys, n=1, cutoff=cutoff)
+            if not close:
+                rows.append({"Gare": name, "lat": np.nan, "lon": np.nan, "match": "unmatched", "source": None, "score": np.nan})
+                continue
+            key, match = close[0], "fuzzy"
+        entry = gazetteer.loc[key]
+        score = SequenceMatcher(None, normalise(name), key).ratio()
+        rows.append({"Gare": name, "lat": entry["lat"], "lon": entry["lon"], "match": match, "source": entry["name"], "score": score})
+    return pd.DataFrame(rows, columns=["Gare", "lat", "lon", "match", "source", "score"])
+
+
+def next_locations_path():
+    versions = config.locations_versions()
+    return os.path.join(config.data_dir(), f"locations-v{max(versions, default=0) + 1}.csv")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resolve station coordinates from a local gazetteer.")
+    parser.add_argument("gazetteer", help="CSV of station names and coordinates")
+    parser.add_argument("--data", nargs="+", default=None, help="regularity CSVs (default: the configured data files)")
+    parser.add_argument("--name-column", default="Gare")
+    parser.add_argument("--lat-column", default="lat")
+    parser.add_argument("--lon-column", default="lon")
+    parser.add_argument("--cutoff", type=float, default=FUZZY_CUTOFF)
+    parser.add_argument("--output", default=None, help="default: the next data/locations-v<n>.csv")
+    args = parser.parse_args()
+
+    names = station_names(args.data or config.data_paths())
+    gazetteer = read_gazetteer(args.gazetteer, args.name_column, args.lat_column, args.lon_column)
+    table = resolve(names, gazetteer, get_locations(), args.cutoff)
+    output = args.output or next_locations_path()
+    table.to_csv(output, index=False)
+
+    print(table["match"].value_counts().to_string())
+    for row in table[table["match"] == "fuzzy"].itertuples():
+        print(f"fuzzy: {row.Gare} -> {row.source} ({row.score:.2f})")
+    for name in table.loc[table["match"] == "unmatched", "Gare"]:
+        print(f"unmatched: {name}")
+    print(f"{len(table)} stations written to {output}")
@@ -0,0 +1,231 @@
+"""Build and incrementally refresh the persisted dataset and rollups.
+
+The SNCF extract grows by one month at a time. When the CSV changes, the
+previous cached dataset is reused: only the rows of months it does not
+contain yet are parsed and cleaned, then appended, and the rollup cube is
+extended with the same rows.
+
+When the data directory holds several CSVs (see config.data_paths), they
+are parsed and cleaned in parallel, one worker process per file, and any
+change to them rebuilds the whole dataset.
+
+Run ``python -m util.ingest`` after dropping a new extract in place to
+refresh the cache before the app is (re)started: server processes then
+only map the cached files, and share them (see util.cache.cached_frame).
+"""
+import csv
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from io import StringIO
+
+from util import config
+from util.cache import cached_frame, cached_pickle
+from util.features import FEATURES_VERSION, add_features
+from util.io import CLEANING_VERSION, load_data, process_data
+from util.quality import REPORT_VERSION, add_counts, merge_reports, quality_report
+from util.rollup import GRAINS, ROLLUP_VERSION, build_rollups, merge_rollups
+from util.schema import concat_frames
+
+DATASET_NAME = f"dataset-v{CLEANING_VERSION}.{FEATURES_VERSION}"
+ROLLUPS_NAME = f"rollups-v{CLEANING_VERSION}.{FEATURES_VERSION}.{ROLLUP_VERSION}"
+QUALITY_NAME = f"quality-v{CLEANING_VERSION}.{FEATURES_VERSION}.{REPORT_VERSION}"
+# Below this total size, starting worker processes costs more than it saves.
+PARALLEL_MIN_BYTES = 32 * 2**20
+
+
+def build_dataset(path=None, skip_months=(), stats=None, quarantine=None):
+    """Parse, clean and enrich the CSV, optionally ignoring some months.
+
+    Line and row rejection counters are added to `stats` when a dict is given,
+    and rejected CSV records are written to the `quarantine` file object.
+    """
+    raw = load_data(path, skip_months, stats, quarantine)
+    return add_features(process_data(raw, stats))
+
+
+def load_source(path):
+    """build_dataset for one file of a multi-file ingestion, run in a worker process.
+
+    Returns the frame, its pipeline counters and its rejected records as
+    (line number, reason, text) rows, since a file object cannot be shared
+    between processes.
+    """
+    stats = {}
+    quarantine = StringIO()
+    df = build_dataset(path, stats=stats, quarantine=quarantine)
+    return df, stats, list(csv.reader(StringIO(quarantine.getvalue())))
+
+
+def build_sources(paths, stats=None, quarantine=None, workers=None):
+    """build_dataset over several CSVs of the same schema, in parallel.
+
+    Each file goes through the line rules of load_data and the cleaning of
+    process_data on its own, in a pool of `workers` processes (one per core
+    by default, largest files first, in-process for less than
+    PARALLEL_MIN_BYTES of input), and the typed results are concatenated
+    with shared categorical dictionaries.
+    Counters of every file are added to `stats`; rejected records are written
+    to `quarantine` with their line numbers prefixed by the file name.
+    """
+    if len(paths) == 1:
+        return build_dataset(paths[0], stats=stats, quarantine=quarantine)
+
+    workers = min(len(paths), workers or os.cpu_count() or 1)
+    if sum(map(os.path.getsize, paths)) < PARALLEL_MIN_BYTES:
+        workers = 1
+    largest_first = sorted(paths, key=os.path.getsize, reverse=True)
+    if workers > 1:
+        # spawn rather than fork: the Streamlit server process is multi-threaded
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=context) as pool:
+            results = dict(zip(largest_first, pool.map(load_source, largest_first)))
+    else:
+        results = {path: load_source(path) for path in largest_first}
+
+    writer = csv.writer(quarantine) if quarantine is not None else None
+    for path in paths:
+        _, file_stats, rejected = results[path]
+        add_counts(stats, **file_stats)
+        if writer is not None:
+            name = os.path.basename(path)
+            writer.writerows([f"{name}:{line}", reason, text] for line, reason, text in rejected)
+    return concat_frames([results[path][0] for path in paths])
+
+
+def data_sources(path=None):
+    """CSVs to ingest: `path` (a path or a list of paths), by default config.data_paths()."""
+    if path is None:
+        return config.data_paths()
+    return [path] if isinstance(path, (str, os.PathLike)) else list(path)
+
+
+def ingested_months(df):
+    """Months ("YYYY-MM") present in a cleaned dataset."""
+    return set(df["Date"].dt.strftime("%Y-%m").unique())
+
+
+def append_dataset(previous, path=None, stats=None, quarantine=None):
+    """Append the months of `path` missing from `previous`.
+
+    Rows of months already ingested are skipped before parsing, so the cost
+    is proportional to the new rows. Corrections to past months are not
+    picked up; remove the cache directory to force a full rebuild.
+    """
+    raw = load_data(path, ingested_months(previous), stats, quarantine)
+    if raw.empty:
+        return previous
+    added = add_features(process_data(raw, stats))
+    return concat_frames([previous, added])
+
+
+def append_rollups(cube, df):
+    """Extend `cube` with the rows of `df` whose month it does not cover yet."""
+    time_grain = GRAINS[0]
+    known = cube[time_grain].index.get_level_values("Date")
+    added = df[~df["Date"].isin(known)]
+    if added.empty:
+        return cube
+    return merge_rollups(cube, build_rollups(added))
+
+
+def load_dataset(path=None):
+    """Cleaned, enriched dataset for `path`, from the cache when possible.
+
+    When the dataset has to be (re)built, the data-quality report of that
+    build is persisted next to it, see load_quality; after an incremental
+    update, the report of the appended rows is merged into the previous one.
+    `path` may be a list of CSVs, which are ingested together (see build_sources).
+    """
+    sources = data_sources(path)
+    stats = {}
+    appended = []
+
+    def build():
+        with open_quarantine("w") as quarantine:
+            return build_sources(sources, stats, quarantine)
+
+    def update(previous):
+        with open_quarantine("a") as quarantine:
+            df = append_dataset(previous, sources[0], stats, quarantine)
+        appended.append(df.iloc[len(previous):])
+        return df
+
+    df = cached_frame(DATASET_NAME, sources, build=build, update=incremental(sources, update))
+    if stats:
+        def update_report(previous):
+            return merge_reports(previous, quality_report(appended[0], stats))
+
+        cached_pickle(
+            QUALITY_NAME,
+            sources,
+            build=lambda: quality_report(df, stats),
+            update=update_report if appended else None,
+        )
+    return df
+
+
+def incremental(sources, update):
+    """`update` if the cache of `sources` can be extended month by month, else None.
+
+    Only a single growing extract can: with several files, a new or changed
+    one may add rows to months that are already ingested.
+    """
+    return update if len(sources) == 1 else None
+
+
+@contextmanager
+def open_quarantine(mode):
+    """Quarantine CSV for rejected records, or None if it cannot be written.
+
+    Mode "w" starts a new file (full rebuild), "a" appends (incremental update).
+    """
+    path = config.quarantine_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        f = open(path, mode, encoding="utf-8", newline="")
+    except OSError:
+        yield None
+        return
+    with f:
+        if mode == "w":
+            csv.writer(f).writerow(["line", "reason", "text"])
+        yield f
+
+
+def load_quality(df, path=None):
+    """Data-quality report of `df` (the dataset loaded from `path`).
+
+    Normally written by load_dataset; if it is missing from the cache, the
+    pipeline is run once more just to collect the rejection counters.
+    """
+    sources = data_sources(path)
+
+    def build():
+        stats = {}
+        build_sources(sources, stats)
+        return quality_report(df, stats)
+
+    return cached_pickle(QUALITY_NAME, sources, build=build)
+
+
+def load_rollups(df, path=None):
+    """Rollup cube of `df` (the dataset loaded from `path`), from the cache when possible."""
+    sources = data_sources(path)
+    return cached_pickle(
+        ROLLUPS_NAME,
+        sources,
+        build=lambda: build_rollups(df),
+        update=incremental(sources, lambda previous: append_rollups(previous, df)),
+    )
+
+
+if __name__ == "__main__":
+    dataset = load_dataset()
+    load_rollups(dataset)
+    load_quality(dataset)
+    print(
+        f"{len(dataset):,} rows, {len(ingested_months(dataset))} months"
+        f" from {len(data_sources())} file(s) cached in {config.cache_dir()}"
+    )
@@ -1,47 +1,217 @@
+import csv
+import numpy as np
 import pandas as pd
-from io import StringIO
 import re
+from io import StringIO
+
+from util import config
+from util.quality import add_counts
+from util.schema import TEXT_COLUMNS, apply_schema
+
+LINE_PATTERN = re.compile(r"^20\d{2}-\d{2}")
+# A quote at the start of a field
+FIELD_QUOTE = re.compile(r'(?:^|;)"')
+# Bump whenever process_data changes its output so on-disk caches are rebuilt.
+CLEANING_VERSION = 3
+
+
+REJECT_NO_DATE = "no_date"
+REJECT_FIELD_COUNT = "field_count"
+REJECT_OPEN_QUOTE = "unterminated_quote"
+# A quoted field spanning more physical lines than this is treated as broken.
+MAX_RECORD_LINES = 100
+
+
+def open_quote(line, quoted=False):
+    """Whether `line` ends inside a quoted field (`quoted`: it starts inside one).
+
+    Only a quote opening a field starts a quoted field, as for the CSV parser:
+    a quote inside an unquoted field (e.g. `Retard de 5" sur la ligne`) is
+    literal text. Inside a quoted field, `""` is an escaped quote.
+    """
+    if '"' not in line:
+        return quoted
+    pos = 0
+    while True:
+        if not quoted:
+            match = FIELD_QUOTE.search(line, pos)
+            if match is None:
+                return False
+            quoted, pos = True, match.end()
+        end = line.find('"', pos)
+        if end < 0:
+            return True
+        if line.startswith('"', end + 1):
+            pos = end + 2
+        else:
+            quoted, pos = False, end + 1
+
+
+class LineFilter:
+    """Read-only file object that only lets valid data records through.
+
+    A record is kept when it starts with a 20YY-MM date and has the same
+    number of fields as the header. Quoted fields may span several physical
+    lines (multi-line delay comments): such lines are joined back into one
+    record, and fields are counted quote-aware. Records are pulled from the
+    underlying file lazily, as the CSV parser asks for more text, so the file
+    is scanned only once.
 
-def load_data():
-    """Load and clean data from a CSV file."""
-    
-    pattern = re.compile(r"^20\d{2}-\d{2}")
-    path = "../data/data.csv"
-    clean_lines = []
-    expected_cols = None
+    Records of the months listed in `skip_months` ("YYYY-MM") are dropped
+    before parsing; they are not counted as rejected, and neither are the
+    lines without a date that follow them (which were already rejected when
+    that month was ingested). Rejected text is written
+    to the `quarantine` file object, if given, as CSV rows of
+    (line number, reason, text).
+    """
 
-    with open(path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
+    def __init__(self, f, skip_months=(), quarantine=None):
+        self.f = f
+        self.skip_months = frozenset(skip_months)
+        # Whether the last dated record was in skip_months
+        self.skipping = False
+        self.quarantine = csv.writer(quarantine) if quarantine is not None else None
+        self.header = f.readline()
+        self.expected_cols = self.header.count(";") + 1
+        self.buffer = self.header
+        self.records = self._records()
+        self.kept = 0
+        self.recovered = 0
+        self.rejected = 0
+        self.reasons = {}
 
-    header = lines[0]
-    clean_lines.append(header)
+    def field_count(self, record):
+        if '"' not in record:
+            return record.count(";") + 1
+        return len(next(csv.reader(StringIO(record), delimiter=";")))
 
-    for line in lines[1:]:
-        if pattern.match(line.strip()):
-            n_cols = line.count(";") + 1
-            if expected_cols is None:
-                expected_cols = header.count(";") + 1
-            if n_cols == expected_cols:
-                clean_lines.append(line)
+    def reject(self, line_no, text, reason):
+        self.rejected += 1
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        if self.quarantine is not None:
+            self.quarantine.writerow([line_no, reason, text.rstrip("\n")])
 
-    return pd.read_csv(StringIO("".join(clean_lines)), sep=";")
+    def _records(self):
+        """Yield (line number, text, physical lines) for each logical record.
 
+        A record continues on the next lines only while one of its fields
+        opened with a quote that is not closed yet. If no closing quote comes
+        within MAX_RECORD_LINES lines (or before the end of the file), only
+        the opening line is rejected and the following lines are read again
+        as records of their own.
+        """
+        lines = enumerate(self.f, start=2)
+        replay, pending = [], []
+        while True:
+            item = replay.pop(0) if replay else next(lines, None)
+            if item is None and not pending:
+                return
+            if not pending:
+                if LINE_PATTERN.match(item[1]) and open_quote(item[1]):
+                    pending = [item]
+                else:
+                    yield item[0], item[1], 1
+                continue
+            if item is not None:
+                pending.append(item)
+                if not open_quote(item[1], quoted=True):
+                    yield pending[0][0], "".join(line for _, line in pending), len(pending)
+                    pending = []
+                    continue
+                if len(pending) < MAX_RECORD_LINES:
+                    continue
+            # Unterminated quote: reject the opening line, read the others again
+            if pending[0][1][:7] not in self.skip_months:
+                self.reject(pending[0][0], pending[0][1], REJECT_OPEN_QUOTE)
+            replay = pending[1:] + replay
+            pending = []
 
+    def read(self, size=-1):
+        parts = [self.buffer]
+        length = len(self.buffer)
+        while size < 0 or length < size:
+            item = next(self.records, None)
+            if item is None:
+                break
+            line_no, record, n_lines = item
+            if LINE_PATTERN.match(record.strip()) is None:
+                if not self.skipping:
+                    self.reject(line_no, record, REJECT_NO_DATE)
+                continue
+            self.skipping = record[:7] in self.skip_months
+            if self.skipping:
+                continue
+            if self.field_count(record) != self.expected_cols:
+                self.reject(line_no, record, REJECT_FIELD_COUNT)
+            else:
+                parts.append(record)
+                length += len(record)
+                self.kept += 1
+                self.recovered += n_lines > 1
+        data = "".join(parts)
+        if size < 0:
+            self.buffer = ""
+            return data
+        self.buffer = data[size:]
+        return data[:size]
 
-def process_data(df):
+    def __iter__(self):
+        return iter(lambda: self.read(1 << 16), "")
+
+
+def load_data(path=None, skip_months=(), stats=None, quarantine=None):
+    """Load and clean data from a CSV file (see util.config for the default path).
+
+    Accepted/rejected record counts are added to `stats` when a dict is given,
+    and rejected text is written to the `quarantine` file object (see LineFilter).
+    """
+
+    with open(path or config.data_path(), "r", encoding="utf-8") as f:
+        lines = LineFilter(f, skip_months, quarantine)
+        df = pd.read_csv(lines, sep=";", dtype={col: str for col in TEXT_COLUMNS})
+
+    add_counts(
+        stats,
+        lines_kept=lines.kept,
+        lines_rejected=lines.rejected,
+        records_recovered=lines.recovered,
+        rejected_by_reason=lines.reasons,
+    )
+    return df
+
+
+def process_data(df, stats=None):
     df = df.drop(columns=['Commentaire annulations', 'Commentaire retards au départ'])
     df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m')
-    
 
-    # Drop all rows with negative values in numeric columns
+    # Drop all rows with negative (or missing) values in numeric columns,
+    # counting the offending values per column on the way
     num_cols = df.select_dtypes(include=['int64', 'float64']).columns
-    df = df[(df[num_cols] >= 0).all(axis=1)]
-    df.reset_index(drop=True, inplace=True)
-    
-    return df
+    reject = np.zeros(len(df), dtype=bool)
+    negatives, nulls = {}, {}
+    for col in num_cols:
+        values = df[col].to_numpy()
+        negative = values < 0
+        null = ~(values >= 0) & ~negative
+        negatives[col] = negative.sum()
+        nulls[col] = null.sum()
+        reject |= negative | null
+
+    add_counts(
+        stats,
+        rows_loaded=len(df),
+        rows_rejected=reject.sum(),
+        negative_rejects={col: n for col, n in negatives.items() if n},
+        null_rejects={col: n for col, n in nulls.items() if n},
+    )
+
+    if reject.any():
+        df = df[~reject]
+    df = df.reset_index(drop=True)
+
+    return apply_schema(df)
 
 
-def get_locations():
-    path = "C:/Users/grego/Documents/GitHub/ST2DVZ-SNCF-Streamlit-Project/data/locations.csv"
-    df = pd.read_csv(path, sep=",")
+def get_locations(path=None):
+    df = pd.read_csv(path or config.locations_path(), sep=",")
     return df
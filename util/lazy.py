@@ -0,0 +1,29 @@
+import importlib.util
+
+
+class LazyModule:
+    """Stand-in for module `name`, imported on first attribute access (see lazy_import)."""
+
+    def __init__(self, name):
+        self.__name = name
+
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self.__name), attr)
+
+    def __repr__(self):
+        return f"<lazy module {self.__name!r}>"
+
+
+def lazy_import(name):
+    """Module `name`, imported on first attribute access instead of at import time.
+
+    Used by pages for heavy libraries (e.g. plotly.subplots) whose first use
+    comes late in the page or only when a figure is not cached, so that the
+    page starts rendering before they are loaded. The import goes through
+    importlib.import_module, which holds the import lock of the module: a
+    session touching it while another one is importing it waits for the
+    module to be fully initialised.
+    """
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    return LazyModule(name)
@@ -0,0 +1,82 @@
+import pandas as pd
+
+from util.sketch import QuantileSketch
+
+OUTLIER_COLUMN = "Retard moyen de tous les trains à l'arrivée"
+# Bump whenever the report of quality_report changes so on-disk caches are rebuilt.
+REPORT_VERSION = 2
+
+
+def add_counts(stats, **counts):
+    """Accumulate pipeline counters into `stats` (a dict, or None to skip).
+
+    Values are either integers or {column: integer} dicts; both are summed, so
+    the counters of several loads (e.g. incremental appends) can be merged.
+    """
+    if stats is None:
+        return
+    for key, value in counts.items():
+        if isinstance(value, dict):
+            bucket = stats.setdefault(key, {})
+            for col, n in value.items():
+                bucket[col] = bucket.get(col, 0) + int(n)
+        else:
+            stats[key] = stats.get(key, 0) + int(value)
+
+
+def merge_stats(*all_stats):
+    merged = {}
+    for stats in all_stats:
+        add_counts(merged, **stats)
+    return merged
+
+
+def quality_report(df, stats):
+    """Data-quality report of a cleaned dataset and the pipeline counters that produced it.
+
+    `stats` holds the counters filled by load_data/process_data: accepted,
+    recovered (multi-line) and rejected CSV records by reason, and per-column
+    rows dropped for negative or missing values. Null counts are computed
+    here from `df`, and IQR outliers from a quantile sketch of OUTLIER_COLUMN
+    (quartiles within 0.5%), so reports of several parts of a dataset can be
+    combined with merge_reports.
+    """
+    sketch = QuantileSketch().update(df[OUTLIER_COLUMN].to_numpy(dtype="float64"))
+    return _report(len(df), stats, df.isna().sum(), sketch)
+
+
+def merge_reports(previous, report):
+    """Report of the rows of both reports, e.g. a cached dataset and an appended month."""
+    nulls = previous["nulls"].add(report["nulls"], fill_value=0).astype("int64")
+    sketch = previous["sketch"].copy().merge(report["sketch"])
+    stats = merge_stats(previous["stats"], report["stats"])
+    return _report(previous["rows"] + report["rows"], stats, nulls, sketch)
+
+
+def _report(rows, stats, nulls, sketch):
+    q1, q3 = sketch.quantiles([0.25, 0.75])
+    iqr = q3 - q1
+    low, high = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+    return {
+        "rows": rows,
+        "lines_kept": stats.get("lines_kept", 0),
+        "lines_rejected": stats.get("lines_rejected", 0),
+        "records_recovered": stats.get("records_recovered", 0),
+        "rejected_by_reason": pd.Series(stats.get("rejected_by_reason", {}), dtype="int64"),
+        "rows_loaded": stats.get("rows_loaded", 0),
+        "rows_rejected": stats.get("rows_rejected", 0),
+        "negative_rejects": pd.Series(stats.get("negative_rejects", {}), dtype="int64"),
+        "null_rejects": pd.Series(stats.get("null_rejects", {}), dtype="int64"),
+        "nulls": nulls[nulls > 0].sort_values(ascending=False),
+        "outliers": {
+            "column": OUTLIER_COLUMN,
+            "q1": q1,
+            "q3": q3,
+            "low": low,
+            "high": high,
+            "count": sketch.count_outside(low, high),
+        },
+        "sketch": sketch,
+        "stats": stats,
+    }
@@ -0,0 +1,189 @@
+"""Punctuality figures shown by the dashboard pages, without Streamlit.
+
+Each query takes the objects it aggregates: the cleaned dataset `df` (and
+its RouteIndex), the rollup `cube` and the `stations` table. Pages pass their Streamlit-cached
+copies; other consumers (reports, util.api) can omit them to use a copy
+loaded once per process from the on-disk cache.
+"""
+import functools
+
+import numpy as np
+
+from util.cache import freeze
+from util.ingest import load_dataset, load_rollups
+from util.io import get_locations
+from util.rollup import rollup
+from util.routes import RouteIndex
+from util.stations import ARRIVAL, DEPARTURE, build_stations, join_coordinates
+
+ARRIVAL_DELAY = "Retard moyen de tous les trains à l'arrivée"
+DEPARTURE_DELAY = "Retard moyen de tous les trains au départ"
+SERVICES = "Nombre de circulations prévues"
+CANCELLED = "Nombre de trains annulés"
+LATE_DEPARTURES = "Nombre de trains en retard au départ"
+LATE_ARRIVALS = "Nombre de trains en retard à l'arrivée"
+CAUSE_NAMES = {
+    "Prct retard pour causes externes": "External (Weather, etc.)",
+    "Prct retard pour cause infrastructure": "Infrastructure",
+    "Prct retard pour cause gestion trafic": "Traffic Management",
+    "Prct retard pour cause matériel roulant": "Rolling Stock",
+    "Prct retard pour cause gestion en gare et réutilisation de matériel": "Station Management",
+    "Prct retard pour cause prise en compte voyageurs (affluence, gestions PSH, correspondances)": "Passenger Handling",
+}
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+@functools.lru_cache(maxsize=None)
+def shared_data():
+    return freeze(load_dataset())
+
+
+@functools.lru_cache(maxsize=None)
+def shared_rollups():
+    return load_rollups(shared_data())
+
+
+@functools.lru_cache(maxsize=None)
+def shared_route_index():
+    return RouteIndex(shared_data())
+
+
+@functools.lru_cache(maxsize=None)
+def shared_stations():
+    return freeze(build_stations(shared_data(), get_locations()))
+
+
+def monthly_series(cube=None):
+    """Per month: late departures and cancellations (sums), average arrival delay."""
+    cube = shared_rollups() if cube is None else cube
+    return rollup(cube, ["Date"], **{
+        LATE_DEPARTURES: (LATE_DEPARTURES, "sum"),
+        CANCELLED: (CANCELLED, "sum"),
+        ARRIVAL_DELAY: (ARRIVAL_DELAY, "mean"),
+    })
+
+
+def top_delayed_routes(n=10, cube=None):
+    """The `n` routes with the highest average arrival delay, labelled in column `Ligne`."""
+    cube = shared_rollups() if cube is None else cube
+    routes = (
+        rollup(cube, [DEPARTURE, ARRIVAL], **{ARRIVAL_DELAY: (ARRIVAL_DELAY, "mean")})
+        .sort_values(ARRIVAL_DELAY, ascending=False)
+        .head(n)
+    )
+    routes["Ligne"] = routes[DEPARTURE].astype(str) + " → " + routes[ARRIVAL].astype(str)
+    return routes
+
+
+def mean_causes(cube=None):
+    """Average share of each delay cause over the whole dataset (columns Cause, Pourcentage)."""
+    cube = shared_rollups() if cube is None else cube
+    causes = rollup(cube, [], **{col: (col, "mean") for col in CAUSE_NAMES}).iloc[0].reset_index()
+    causes.columns = ["Cause", "Pourcentage"]
+    return causes
+
+
+def station_delays(cube=None, stations=None):
+    """Average departure delay per departure station, with coordinates."""
+    cube = shared_rollups() if cube is None else cube
+    stations = shared_stations() if stations is None else stations
+    delays = rollup(cube, [DEPARTURE], **{DEPARTURE_DELAY: (DEPARTURE_DELAY, "mean")})
+    return join_coordinates(delays, stations, on=DEPARTURE)
+
+
+def station_series(station, df=None, index=None):
+    """Average arrival delay per date of the routes leaving `station` (`index` is the RouteIndex of `df`)."""
+    if df is None:
+        df, index = shared_data(), shared_route_index()
+    rows = index.departures(station) if index is not None else np.flatnonzero(df[DEPARTURE] == station)
+    delays = df[ARRIVAL_DELAY].take(rows)
+    return delays.groupby(df["Date"].take(rows)).mean().reset_index()
+
+
+def station_stats(cube=None, stations=None):
+    """Delay, service and cancellation statistics per departure station (column Station), with coordinates."""
+    cube = shared_rollups() if cube is None else cube
+    stations = shared_stations() if stations is None else stations
+    stats = rollup(cube, [DEPARTURE], **{
+        "Average Delay": (DEPARTURE_DELAY, "mean"),
+        "Delay Std Dev": (DEPARTURE_DELAY, "std"),
+        "Total Services": (SERVICES, "sum"),
+        "Total Cancellations": (CANCELLED, "sum"),
+        "Total Delayed Trains": (LATE_DEPARTURES, "sum"),
+        "Avg Delay of Delayed Trains": ("Retard moyen des trains en retard au départ", "mean"),
+    }).rename(columns={DEPARTURE: "Station"})
+    stats["Cancellation Rate (%)"] = (stats["Total Cancellations"] / stats["Total Services"] * 100).round(2)
+    stats["Punctuality Rate (%)"] = (100 - (stats["Total Delayed Trains"] / stats["Total Services"] * 100)).round(2)
+    return join_coordinates(stats, stations, on="Station")
+
+
+def monthly_profile(cube=None):
+    """Per month of the year (1-12, named in Month_Name): delay, traffic and punctuality."""
+    cube = shared_rollups() if cube is None else cube
+    profile = rollup(cube, ["Month"], **{
+        ARRIVAL_DELAY: (ARRIVAL_DELAY, "mean"),
+        SERVICES: (SERVICES, "sum"),
+        LATE_ARRIVALS: (LATE_ARRIVALS, "sum"),
+        "Punctuality_Rate": ("Punctuality_Rate", "mean"),
+    })
+    profile["Month_Name"] = profile["Month"].map(dict(zip(range(1, 13), MONTH_NAMES)))
+    return profile
+
+
+def route_seasonal_impact(cube=None):
+    """Average arrival delay per route and season, for the busiest quarter of the routes.
+
+    One column per season, plus Summer_Impact (summer minus winter delay, in
+    minutes) and Impact_Pct (relative to winter) when both seasons exist.
+    """
+    cube = shared_rollups() if cube is None else cube
+    pivot = rollup(cube, [DEPARTURE, ARRIVAL, "Season"], **{
+        ARRIVAL_DELAY: (ARRIVAL_DELAY, "mean"),
+    }).pivot_table(index=[DEPARTURE, ARRIVAL], columns="Season", values=ARRIVAL_DELAY, aggfunc="mean", observed=True)
+    pivot.columns = list(pivot.columns)
+    if "Summer" not in pivot.columns or "Winter" not in pivot.columns:
+        return pivot.reset_index()
+
+    pivot["Summer_Impact"] = pivot["Summer"] - pivot["Winter"]
+    pivot["Impact_Pct"] = pivot["Summer_Impact"] / pivot["Winter"] * 100
+
+    traffic = rollup(cube, [DEPARTURE, ARRIVAL], **{SERVICES: (SERVICES, "sum")}).set_index([DEPARTURE, ARRIVAL])[SERVICES]
+    significant = traffic[traffic > traffic.quantile(0.75)].index
+    return pivot.loc[pivot.index.isin(significant)].reset_index()
+
+
+def seasonal_causes(cube=None):
+    """Average share of each delay cause (rows, readable names) per season (columns)."""
+    cube = shared_rollups() if cube is None else cube
+    causes = rollup(cube, ["Season"], **{col: (col, "mean") for col in CAUSE_NAMES}).set_index("Season").T
+    causes.index = list(CAUSE_NAMES.values())
+    return causes
+
+
+def delay_heatmap(cube=None):
+    """Average arrival delay by month (rows) and year (columns)."""
+    cube = shared_rollups() if cube is None else cube
+    delays = rollup(cube, ["Year", "Month"], **{ARRIVAL_DELAY: (ARRIVAL_DELAY, "mean")})
+    return delays.pivot(index="Month", columns="Year", values=ARRIVAL_DELAY)
+
+
+def summer_impact(df=None, passengers_per_train=300, compensation_threshold=30):
+    """Cost of summer delays against the winter baseline.
+
+    Returns excess delay minutes (summer delay-minutes minus the winter ones
+    scaled to the number of summer rows), summer services, the passenger
+    hours lost at `passengers_per_train`, and the summer services of rows
+    whose average delay exceeds `compensation_threshold` minutes.
+    """
+    df = shared_data() if df is None else df
+    summer = df[df["Season"] == "Summer"]
+    winter = df[df["Season"] == "Winter"]
+    summer_delays = (summer[ARRIVAL_DELAY] * summer[SERVICES]).sum()
+    winter_delays = (winter[ARRIVAL_DELAY] * winter[SERVICES]).sum()
+    excess = summer_delays - (winter_delays / len(winter) * len(summer))
+    return {
+        "excess_delay_minutes": float(excess),
+        "summer_services": int(summer[SERVICES].sum()),
+        "passenger_hours_lost": float(excess * passengers_per_train / 60),
+        "compensation_risk": int(summer.loc[summer[ARRIVAL_DELAY] > compensation_threshold, SERVICES].sum()),
+    }
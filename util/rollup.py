@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+from util.sketch import merge_moments
+
+DEPARTURE = "Gare de départ"
+ARRIVAL = "Gare d'arrivée"
+
+# Grains materialised by build_rollups. Any query whose dimensions are a
+# subset of one of these is answered by merging that grain's groups.
+# Year/Month/Season depend on Date only, so the time grain has one group per month.
+GRAINS = [
+    ("Date", "Year", "Month", "Season"),
+    (DEPARTURE, ARRIVAL, "Season"),
+]
+
+STATES = ("count", "sum", "m2")
+# Bump whenever the states of build_rollups change so on-disk caches are rebuilt.
+ROLLUP_VERSION = 2
+
+
+def build_rollups(df, grains=GRAINS):
+    """Materialise mergeable aggregate states for every numeric column at each grain.
+
+    For each measure the state is the count of non-null values, their sum and
+    the sum of their squared deviations from the mean (M2), which is enough to
+    recover sum, mean and std of any coarser grouping without going back to
+    the rows (see util.sketch.merge_moments).
+    """
+    dims = {dim for grain in grains for dim in grain}
+    measures = [
+        col for col in df.select_dtypes(include="number").columns
+        if col not in dims
+    ]
+
+    values = df[measures].astype("float64")
+    cube = {}
+    for grain in grains:
+        groups = values.groupby([df[dim] for dim in grain], observed=True)
+        count = groups.count()
+        # groupby var is computed with Welford's algorithm
+        m2 = (groups.var(ddof=0) * count).fillna(0)
+        cube[grain] = _states(count, groups.sum(), m2)
+    return cube
+
+
+def merge_rollups(left, right):
+    """Combine two cubes built with the same grains (e.g. an old and a new month)."""
+    merged = {}
+    for grain in left:
+        states = pd.concat([left[grain], right[grain]])
+        keys = []
+        for dim in grain:
+            key = states.index.get_level_values(dim)
+            left_level, right_level = (cube[grain].index.get_level_values(dim) for cube in (left, right))
+            if isinstance(left_level.dtype, pd.CategoricalDtype):
+                # Levels with different categories are concatenated as object
+                key = key.astype(pd.CategoricalDtype(left_level.categories.union(right_level.categories)))
+            keys.append(key)
+        merged[grain] = _merge(states, keys)
+    return merged
+
+
+def rollup(cube, by, **aggs):
+    """Answer a grouped aggregation from the cube.
+
+    `by` is a list of dimensions (possibly empty for a grand total) and each
+    keyword is a named aggregation `name=(measure, stat)` with stat one of
+    "sum", "mean", "std" or "count", like pandas' named aggregation::
+
+        rollup(cube, ["Gare de départ"], delay=("Retard moyen de tous les trains au départ", "mean"))
+
+    Returns a DataFrame with `by` as regular columns, sorted by them.
+    """
+    by = list(by)
+    grain = _find_grain(cube, by)
+    # Only the requested measures are merged
+    table = cube[grain][list(dict.fromkeys(measure for measure, _ in aggs.values()))]
+    keys = [table.index.get_level_values(dim) for dim in by] or np.zeros(len(table), dtype=int)
+    merged = _merge(table, keys)
+
+    result = pd.DataFrame(index=merged.index)
+    for name, (measure, stat) in aggs.items():
+        result[name] = _finalise(merged, measure, stat)
+
+    return result.reset_index(drop=not by)
+
+
+def _merge(states, keys):
+    """Merge the (measure, state) columns of `states` into one row per group of `keys`."""
+    return _states(*merge_moments(*(states.xs(state, axis=1, level=1) for state in STATES), keys))
+
+
+def _states(count, total, m2):
+    """Frame of (measure, state) columns from one frame of measures per state."""
+    return pd.concat(dict(zip(STATES, (count, total, m2))), axis=1).swaplevel(axis=1)
+
+
+def _find_grain(cube, by):
+    candidates = [grain for grain in cube if set(by) <= set(grain)]
+    if not candidates:
+        raise KeyError(f"No rollup grain covers {by}; available grains: {list(cube)}")
+    return min(candidates, key=lambda grain: len(cube[grain]))
+
+
+def _finalise(merged, measure, stat):
+    count = merged[(measure, "count")]
+    total = merged[(measure, "sum")]
+    if stat == "count":
+        return count
+    if stat == "sum":
+        return total
+    if stat == "mean":
+        return total / count.replace(0, np.nan)
+    if stat == "std":
+        # M2 is meaningless for groups holding infinite values (e.g. rates of routes without trains)
+        return np.sqrt((merged[(measure, "m2")] / (count - 1)).where((count > 1) & np.isfinite(total)))
+    raise ValueError(f"Unknown statistic {stat!r}; expected one of sum, mean, std, count")
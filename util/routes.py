@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+from util.features import DELAY_BINS, DELAY_LABELS
+from util.rollup import rollup
+from util.stations import ARRIVAL, DEPARTURE, join_coordinates
+
+ROUTE_MEASURES = {
+    "Average Delay": ("Retard moyen de tous les trains à l'arrivée", "mean"),
+    "Total Services": ("Nombre de circulations prévues", "sum"),
+    "Total Cancellations": ("Nombre de trains annulés", "sum"),
+    "Total Delayed Trains": ("Nombre de trains en retard à l'arrivée", "sum"),
+}
+# Route keys are counted in a dense array up to this many (departure, arrival) slots.
+MAX_DENSE_KEYS = 1 << 22
+
+
+def build_routes(cube, stations):
+    """Route dimension table: one row per (departure, arrival) pair of the cube.
+
+    Holds the ROUTE_MEASURES aggregates, a `Delay Category` from the average
+    arrival delay, and the coordinates of both ends as dep_lat/dep_lon and
+    arr_lat/arr_lon (NaN when unknown).
+    """
+    routes = rollup(cube, [DEPARTURE, ARRIVAL], **ROUTE_MEASURES)
+    routes["Delay Category"] = pd.cut(routes["Average Delay"], bins=DELAY_BINS, labels=DELAY_LABELS, right=False)
+    routes = join_coordinates(routes, stations, on=DEPARTURE, prefix="dep_")
+    routes = join_coordinates(routes, stations, on=ARRIVAL, prefix="arr_")
+    return routes
+
+
+class RouteIndex:
+    """Row positions of the fact table grouped by route and by station.
+
+    Built once per dataset: `route_id` gives the route of each row (an index
+    into `routes`, the table of (departure, arrival) pairs with their row
+    counts), and rows are sorted by route, so that the rows of a route, and
+    those leaving a station, are contiguous slices of one array; rows
+    reaching a station are slices of a second one. Lookups return row
+    positions for `df.take`, in table order within each route, instead of
+    scanning the station columns.
+    """
+
+    def __init__(self, df):
+        dtype = df[DEPARTURE].dtype
+        self.stations = dtype.categories
+        # Station codes are shifted by one so that rows without a station (code -1) get slot 0
+        slots = len(self.stations) + 1
+        departure = df[DEPARTURE].cat.codes.to_numpy().astype(np.int64) + 1
+        arrival = df[ARRIVAL].astype(dtype).cat.codes.to_numpy().astype(np.int64) + 1
+
+        self.route_keys, route_id = _distinct(departure * slots + arrival, slots * slots)
+        self.route_id = route_id.astype(np.int32)
+        self.order = _stable_order(self.route_id, len(self.route_keys))
+        self.route_offsets = _offsets(np.bincount(self.route_id, minlength=len(self.route_keys)))
+        self.departure_offsets = _offsets(np.bincount(departure, minlength=slots))
+        self.arrival_order = _stable_order(arrival, slots)
+        self.arrival_offsets = _offsets(np.bincount(arrival, minlength=slots))
+
+        dep, arr = np.divmod(self.route_keys, slots)
+        routes = pd.DataFrame({
+            DEPARTURE: pd.Categorical.from_codes(dep - 1, dtype=dtype),
+            ARRIVAL: pd.Categorical.from_codes(arr - 1, dtype=dtype),
+            "rows": np.diff(self.route_offsets),
+        })
+        self.routes = routes[(dep > 0) & (arr > 0)]
+
+    def slot(self, station):
+        code = self.stations.get_indexer([station])[0]
+        return None if code < 0 else code + 1
+
+    def departures(self, station):
+        """Positions of the rows leaving `station` (empty for an unknown station)."""
+        slot = self.slot(station)
+        if slot is None:
+            return self.order[:0]
+        return self.order[self.departure_offsets[slot]:self.departure_offsets[slot + 1]]
+
+    def arrivals(self, station):
+        """Positions of the rows reaching `station` (empty for an unknown station)."""
+        slot = self.slot(station)
+        if slot is None:
+            return self.arrival_order[:0]
+        return self.arrival_order[self.arrival_offsets[slot]:self.arrival_offsets[slot + 1]]
+
+    def route(self, departure, arrival):
+        """Positions of the rows of the route `departure` → `arrival` (empty if there is none)."""
+        dep, arr = self.slot(departure), self.slot(arrival)
+        if dep is None or arr is None:
+            return self.order[:0]
+        key = dep * (len(self.stations) + 1) + arr
+        route = np.searchsorted(self.route_keys, key)
+        if route == len(self.route_keys) or self.route_keys[route] != key:
+            return self.order[:0]
+        return self.order[self.route_offsets[route]:self.route_offsets[route + 1]]
+
+
+def _distinct(keys, size):
+    """Sorted distinct values of `keys` (integers in range(size)) and the position of each key among them."""
+    if size > MAX_DENSE_KEYS:
+        return np.unique(keys, return_inverse=True)
+    present = np.flatnonzero(np.bincount(keys, minlength=size))
+    position = np.zeros(size, dtype=np.int64)
+    position[present] = np.arange(len(present))
+    return present, position[keys]
+
+
+def _stable_order(ids, n):
+    """Stable argsort of `ids` (integers in range(n)), on the narrowest dtype so numpy uses a radix sort."""
+    return np.argsort(ids.astype(np.min_scalar_type(max(n - 1, 0))), kind="stable").astype(np.int32)
+
+
+def _offsets(counts):
+    return np.concatenate([[0], np.cumsum(counts)])
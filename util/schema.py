@@ -0,0 +1,95 @@
+import pandas as pd
+
+# Free-text columns; forced to str when parsing so that a chunk in which they
+# are all empty is not inferred as float (and mistaken for a numeric column).
+TEXT_COLUMNS = [
+    "Service",
+    "Gare de départ",
+    "Gare d'arrivée",
+    "Commentaire annulations",
+    "Commentaire retards au départ",
+    "Commentaire retards à l'arrivée",
+]
+STATION_COLUMNS = ["Gare de départ", "Gare d'arrivée"]
+CATEGORY_COLUMNS = ["Service", "Commentaire retards à l'arrivée"]
+COUNT_COLUMNS = [
+    "Durée moyenne du trajet",
+    "Nombre de circulations prévues",
+    "Nombre de trains annulés",
+    "Nombre de trains en retard au départ",
+    "Nombre de trains en retard à l'arrivée",
+    "Nombre trains en retard > 15min",
+    "Nombre trains en retard > 30min",
+    "Nombre trains en retard > 60min",
+]
+PERCENT_PREFIX = "Prct retard"
+
+
+def apply_schema(df):
+    """Convert the cleaned fact table to compact dtypes.
+
+    Both station columns share one categorical dictionary so they can be
+    compared and joined on codes; service and commentary become categoricals,
+    counts are downcast to the smallest integer type holding them and the
+    cause percentages become float32.
+    """
+    df = df.copy()
+
+    stations = pd.concat([df[col] for col in STATION_COLUMNS]).dropna().unique()
+    station_dtype = pd.CategoricalDtype(sorted(stations))
+    for col in STATION_COLUMNS:
+        df[col] = df[col].astype(station_dtype)
+
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype("category")
+
+    for col in COUNT_COLUMNS:
+        df[col] = pd.to_numeric(df[col], downcast="integer")
+
+    for col in df.columns:
+        if col.startswith(PERCENT_PREFIX):
+            df[col] = df[col].astype("float32")
+
+    return df
+
+
+def concat_frames(frames):
+    """Concatenate cleaned frames and rebuild their shared categorical dictionaries.
+
+    Other unordered categoricals (e.g. Season) are rebuilt too, since frames
+    of different months do not hold the same categories.
+    """
+    categorical = [
+        col for col, dtype in frames[0].dtypes.items()
+        if isinstance(dtype, pd.CategoricalDtype) and not dtype.ordered
+    ]
+    text = {col: object for col in STATION_COLUMNS + CATEGORY_COLUMNS + categorical}
+    df = pd.concat([df.astype(text) for df in frames], ignore_index=True)
+    other = [col for col in categorical if col not in STATION_COLUMNS + CATEGORY_COLUMNS]
+    return apply_schema(df.astype({col: "category" for col in other}))
+
+
+def memory_report(df):
+    """Per-column memory of `df` against the default dtypes pandas would have used."""
+    schema_columns = STATION_COLUMNS + CATEGORY_COLUMNS + COUNT_COLUMNS
+    rows = []
+    for col in df.columns:
+        if col not in schema_columns and not col.startswith(PERCENT_PREFIX):
+            continue
+        typed = df[col]
+        if isinstance(typed.dtype, pd.CategoricalDtype):
+            untyped = typed.astype(object)
+        elif pd.api.types.is_integer_dtype(typed):
+            untyped = typed.astype("int64")
+        elif pd.api.types.is_float_dtype(typed):
+            untyped = typed.astype("float64")
+        else:
+            untyped = typed
+        rows.append({
+            "Column": col,
+            "Default Type": str(untyped.dtype),
+            "Schema Type": str(typed.dtype),
+            "Default (KB)": untyped.memory_usage(index=False, deep=True) / 1024,
+            "Schema (KB)": typed.memory_usage(index=False, deep=True) / 1024,
+        })
+    return pd.DataFrame(rows)
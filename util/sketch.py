@@ -0,0 +1,118 @@
+"""Mergeable summaries of numeric values.
+
+The pipeline computes them once per build (rollups, data-quality report)
+and once per appended month, then merges the two, rather than per parsed
+chunk: outliers and rollups are defined on cleaned rows, which only exist
+after process_data.
+
+merge_moments combines grouped (count, sum, M2) states, M2 being the sum of
+squared deviations from the mean, with the parallel formula of Chan et al.,
+so mean and variance can be computed per month or route and combined across
+them without going back to the rows, and without the cancellation of a sum
+of squares.
+
+QuantileSketch counts values in logarithmic buckets (DDSketch): any
+quantile is estimated within a relative error `accuracy`, and two sketches
+combine exactly by adding their bucket counts.
+"""
+import math
+
+import numpy as np
+
+DEFAULT_ACCURACY = 0.005
+# Values closer to zero than this are counted as zero by QuantileSketch.
+MIN_VALUE = 1e-9
+
+
+def merge_moments(count, total, m2, keys):
+    """Merge grouped (count, sum, M2) states into one row per group of `keys`.
+
+    `count`, `total` and `m2` are aligned frames (one column per measure, one
+    row per part); `keys` is anything DataFrame.groupby accepts for them.
+    The M2 of a group is the M2 of its parts plus, for each part, its count
+    times the squared deviation of its mean from the group mean.
+    Returns the merged (count, total, m2) frames.
+    """
+    group_count = count.groupby(keys, observed=True).transform("sum")
+    group_mean = total.groupby(keys, observed=True).transform("sum") / group_count.where(group_count > 0)
+    part_mean = total / count.where(count > 0)
+    spread = (count * (part_mean - group_mean) ** 2).fillna(0)
+    return tuple(
+        frame.groupby(keys, observed=True).sum()
+        for frame in (count, total, m2 + spread)
+    )
+
+
+class QuantileSketch:
+    """Quantiles of a stream of values within a relative error (DDSketch).
+
+    A positive value x is counted in bucket ceil(log(x) / log(gamma)), with
+    gamma = (1 + accuracy) / (1 - accuracy), and estimated by the middle of
+    its bucket, so estimates are within `accuracy` of the true value;
+    negative values are counted the same way by magnitude, and values
+    within MIN_VALUE of zero as zero. Memory grows with the logarithm of
+    the value range, not with the number of values.
+    """
+
+    def __init__(self, accuracy=DEFAULT_ACCURACY):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+
+    def update(self, values):
+        """Add an array of values (NaN ignored)."""
+        values = np.asarray(values, dtype="float64")
+        values = values[~np.isnan(values)]
+        self.zeros += int((np.abs(values) < MIN_VALUE).sum())
+        self._add(self.positive, values[values >= MIN_VALUE])
+        self._add(self.negative, -values[values <= -MIN_VALUE])
+        return self
+
+    def merge(self, other):
+        """Add the values counted by `other`, a sketch of the same accuracy."""
+        if other.accuracy != self.accuracy:
+            raise ValueError(f"Cannot merge sketches of accuracy {self.accuracy} and {other.accuracy}")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for bucket, n in other_store.items():
+                store[bucket] = store.get(bucket, 0) + n
+        self.zeros += other.zeros
+        return self
+
+    def copy(self):
+        sketch = QuantileSketch(self.accuracy)
+        return sketch.merge(self)
+
+    def quantiles(self, qs):
+        """Estimates of the quantiles `qs` (between 0 and 1); NaN for an empty sketch."""
+        values, counts = self._buckets()
+        if not counts.sum():
+            return [math.nan for _ in qs]
+        cumulative = np.cumsum(counts)
+        ranks = np.asarray(qs, dtype="float64") * (cumulative[-1] - 1)
+        return [float(v) for v in values[np.searchsorted(cumulative, ranks, side="right")]]
+
+    def count_outside(self, low, high):
+        """Estimated number of values below `low` or above `high`."""
+        values, counts = self._buckets()
+        return int(counts[(values < low) | (values > high)].sum())
+
+    def _add(self, store, magnitudes):
+        if not len(magnitudes):
+            return
+        buckets, counts = np.unique(np.ceil(np.log(magnitudes) / math.log(self.gamma)).astype(np.int64), return_counts=True)
+        for bucket, n in zip(buckets.tolist(), counts.tolist()):
+            store[bucket] = store.get(bucket, 0) + n
+
+    def _buckets(self):
+        """(estimated values, counts) of all buckets, in increasing order of value."""
+        def estimates(store):
+            buckets = np.array(sorted(store), dtype="float64")
+            return 2 * self.gamma ** buckets / (self.gamma + 1), np.array([store[b] for b in sorted(store)], dtype="int64")
+
+        pos_values, pos_counts = estimates(self.positive)
+        neg_values, neg_counts = estimates(self.negative)
+        values = np.concatenate([-neg_values[::-1], [0.0], pos_values])
+        counts = np.concatenate([neg_counts[::-1], [self.zeros], pos_counts])
+        return values, counts
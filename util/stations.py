@@ -0,0 +1,47 @@
+import pandas as pd
+
+DEPARTURE = "Gare de départ"
+ARRIVAL = "Gare d'arrivée"
+
+
+def station_categories(df, locations=None):
+    """Sorted dtype covering every station of the fact table (and gazetteer)."""
+    names = [df[DEPARTURE], df[ARRIVAL]]
+    if locations is not None:
+        names.append(locations["Gare"])
+    stations = pd.concat([pd.Series(n.astype(str).unique()) for n in names]).unique()
+    return pd.CategoricalDtype(sorted(stations))
+
+
+def build_stations(df, locations):
+    """Station dimension table: one row per station of the fact table.
+
+    Indexed by `Gare` with the same categories as the fact table station
+    columns, with `lat`/`lon` (NaN when no coordinates are known) and the
+    number of departures/arrivals of each station.
+    """
+    dtype = station_categories(df, locations)
+    coords = locations.assign(Gare=locations["Gare"].astype(dtype)).set_index("Gare")[["lat", "lon"]]
+
+    stations = pd.DataFrame(index=pd.CategoricalIndex(dtype.categories, dtype=dtype, name="Gare"))
+    stations = stations.join(coords)
+    stations["departures"] = df[DEPARTURE].astype(dtype).value_counts()
+    stations["arrivals"] = df[ARRIVAL].astype(dtype).value_counts()
+    stations = stations[stations["departures"] + stations["arrivals"] > 0]
+    return stations
+
+
+def join_coordinates(frame, stations, on=DEPARTURE, prefix=""):
+    """Add `<prefix>lat` and `<prefix>lon` columns for the station named in column `on`."""
+    coords = stations[["lat", "lon"]].add_prefix(prefix)
+    keys = frame[on].astype(stations.index.dtype)
+    matched = coords.reindex(keys).set_axis(frame.index)
+    return pd.concat([frame, matched], axis=1)
+
+
+def missing_coordinates(stations, names=None):
+    """Names of stations without coordinates, optionally limited to `names`."""
+    missing = stations.index[stations["lat"].isna() | stations["lon"].isna()]
+    if names is not None:
+        missing = missing[missing.isin(names)]
+    return missing.astype(str).tolist()
@@ -0,0 +1,56 @@
+import numpy as np
+
+# Pixel widths of the main column of Streamlit's layouts, for charts drawn
+# with use_container_width (the script is not told the browser's width).
+WIDE_CHART_WIDTH = 1200
+CENTERED_CHART_WIDTH = 704
+# A line with more points than pixel columns cannot show more detail, it
+# only costs payload and browser time.
+POINTS_PER_PIXEL = 1
+
+
+def chart_points(width=WIDE_CHART_WIDTH):
+    """Number of samples worth sending for a line chart `width` pixels wide."""
+    return max(3, int(width * POINTS_PER_PIXEL))
+
+
+def lttb(x, y, points):
+    """Indices of the `points` samples of (x, y) kept by Largest-Triangle-Three-Buckets.
+
+    `x` must be sorted (numbers or datetimes) and `y` free of NaN. The first
+    and last samples are always kept; all indices are returned when there
+    are no more than `points` samples.
+    """
+    n = len(x)
+    if n <= points or points < 3:
+        return np.arange(n)
+    x = np.asarray(x)
+    x = (x.view("int64") if x.dtype.kind == "M" else x).astype("float64")
+    y = np.asarray(y, dtype="float64")
+
+    # Interior samples split into points - 2 buckets; one sample is kept per
+    # bucket, the one forming the largest triangle with the previous kept
+    # sample and the mean of the next bucket.
+    edges = np.linspace(1, n - 1, points - 1).astype("int64")
+    edges = np.append(edges, n)
+    selected = np.empty(points, dtype="int64")
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_x = x[stop:edges[i + 2]].mean()
+        next_y = y[stop:edges[i + 2]].mean()
+        area = np.abs((x[a] - next_x) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (next_y - y[a]))
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(frame, x, y, points=None):
+    """Rows of `frame` sorted by column `x` and reduced to `points` rows by LTTB on column `y`.
+
+    `points` defaults to chart_points() of a full-width chart.
+    """
+    points = chart_points() if points is None else points
+    frame = frame.dropna(subset=[y]).sort_values(x)
+    return frame.iloc[lttb(frame[x].to_numpy(), frame[y].to_numpy(), points)]
@@ -0,0 +1,130 @@
+"""Lightweight timing of page renders, code blocks and cached getters.
+
+Records are kept in memory (the last MAX_RECORDS of the process) as dicts:
+time, run, page, kind ("page", "block", "chart" or "cache"), name, seconds
+and, for cached getters, whether the call was a cache "hit" or "miss".
+Streamlit runs each session's script in its own thread, so the current
+page and run are tracked per thread.
+"""
+import functools
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+MAX_RECORDS = 10_000
+RECORDS = deque(maxlen=MAX_RECORDS)
+
+_runs = itertools.count(1)
+_local = threading.local()
+
+
+def start_page(page):
+    """Start timing a run of `page`; its records are tagged with a new run id."""
+    _local.page = page
+    _local.run = next(_runs)
+    _local.started = time.perf_counter()
+
+
+def end_page():
+    """Record the time since start_page (once per run)."""
+    started = getattr(_local, "started", None)
+    if started is not None:
+        _local.started = None
+        record("page", _local.page, time.perf_counter() - started)
+
+
+def record(kind, name, seconds, **extra):
+    RECORDS.append({
+        "time": time.time(),
+        "run": getattr(_local, "run", 0),
+        "page": getattr(_local, "page", None),
+        "kind": kind,
+        "name": name,
+        "seconds": seconds,
+        **extra,
+    })
+
+
+@contextmanager
+def timed(name, kind="block"):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(kind, name, time.perf_counter() - start)
+
+
+def cached(cache):
+    """Apply the memoizing decorator `cache` and record each call as a hit or a miss.
+
+    A call is a miss when the wrapped function body actually runs; nested
+    cached calls (a getter using another one) are told apart with a per-thread
+    stack.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def miss(*args, **kwargs):
+            _local.cache_stack[-1] = True
+            return func(*args, **kwargs)
+
+        memoized = cache(miss)
+
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            stack = _local.__dict__.setdefault("cache_stack", [])
+            stack.append(False)
+            start = time.perf_counter()
+            try:
+                return memoized(*args, **kwargs)
+            finally:
+                missed = stack.pop()
+                record("cache", func.__name__, time.perf_counter() - start, cache="miss" if missed else "hit")
+
+        return call
+
+    return decorate
+
+
+def run_records():
+    """Records of the current run of this thread."""
+    run = getattr(_local, "run", None)
+    return [r for r in list(RECORDS) if r["run"] == run]
+
+
+def summary(records=None):
+    """Calls, total/mean/max seconds and cache hits/misses per (kind, name)."""
+    df = pd.DataFrame(list(RECORDS) if records is None else records)
+    if df.empty:
+        return df
+    if "cache" not in df:
+        df["cache"] = None
+    return (
+        df.assign(hits=df["cache"].eq("hit"), misses=df["cache"].eq("miss"))
+        .groupby(["kind", "name"])
+        .agg(
+            calls=("seconds", "size"),
+            total=("seconds", "sum"),
+            mean=("seconds", "mean"),
+            max=("seconds", "max"),
+            hits=("hits", "sum"),
+            misses=("misses", "sum"),
+        )
+        .sort_values("total", ascending=False)
+        .reset_index()
+    )
+
+
+def dumps(records=None):
+    records = list(RECORDS) if records is None else records
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+
+
+def dump(path, records=None):
+    """Append records (all of them by default) to the JSON lines file `path`."""
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(dumps(records))
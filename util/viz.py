@@ -0,0 +1,49 @@
+from string import Formatter
+
+import numpy as np
+
+
+def hover_template(df, header, lines):
+    """Build a Plotly hovertemplate and the matching customdata for `df`.
+
+    `header` and the value of each `(label, value)` line are str.format-style
+    strings whose placeholders name columns of `df`, with optional d3 format
+    specs, e.g. ``("⏱️ Average Delay", "{Average Delay:.2f} min")``.
+    Placeholders become ``%{customdata[i]:spec}`` references so the text is
+    formatted by the browser instead of row by row in Python.
+
+    Returns ``(customdata, hovertemplate)`` to pass to any Plotly trace.
+    """
+    columns = []
+
+    def translate(text):
+        parts = []
+        for literal, field, spec, _ in Formatter().parse(text):
+            parts.append(literal)
+            if field is None:
+                continue
+            if field not in columns:
+                columns.append(field)
+            spec = f":{spec}" if spec else ""
+            parts.append(f"%{{customdata[{columns.index(field)}]{spec}}}")
+        return "".join(parts)
+
+    rows = [translate(header)]
+    rows += [f"<b>{label}:</b> {translate(value)}" for label, value in lines]
+    template = "<br>".join(rows) + "<extra></extra>"
+
+    return df[columns].to_numpy(), template
+
+
+def route_segments(routes):
+    """Coordinates drawing every route of `routes` as a single Plotly line trace.
+
+    Returns ``(lat, lon)`` arrays holding, for each route with known
+    coordinates, its departure point, its arrival point and a NaN that
+    breaks the line before the next route.
+    """
+    ends = routes[["dep_lat", "dep_lon", "arr_lat", "arr_lon"]].dropna().to_numpy(dtype="float64")
+    gap = np.full(len(ends), np.nan)
+    lat = np.column_stack([ends[:, 0], ends[:, 2], gap]).ravel()
+    lon = np.column_stack([ends[:, 1], ends[:, 3], gap]).ravel()
+    return lat, lon